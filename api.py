@@ -0,0 +1,234 @@
+import json
+from datetime import date, datetime, timedelta
+
+from flask import Blueprint, Response, abort, request
+
+from availability import free_slots
+from models import db, Artist, Venue, Show, Genre, artist_genre, venue_genre
+from pagination import keyset_page, ranked_page, page_args, InvalidCursor
+from queries import with_genre, ARTIST_KEYS, VENUE_AREA_KEYS, SHOW_KEYS
+import search
+
+try:
+    import orjson
+except ImportError:  # optional; the standard library encoder gives the same output, slower
+    orjson = None
+
+# Read-only JSON for mobile clients and aggregators. Every endpoint selects
+# only the columns it returns (?fields=id,name narrows that further) and
+# serializes the lightweight result rows directly, without loading ORM
+# instances or rendering templates. Lists page with the same cursors as the
+# HTML listings: ?after=/?before= plus ?per_page=.
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+ENTITY_FIELDS = ('id', 'name', 'city', 'state', 'phone', 'genres', 'image_link', 'facebook_link', 'website',
+                 'upcoming_shows_count', 'past_shows_count', 'seeking_description')
+ARTIST_FIELDS = ENTITY_FIELDS + ('seeking_venue',)
+VENUE_FIELDS = ENTITY_FIELDS + ('address', 'seeking_talent')
+
+# the longest window /venues/<id>/free-slots answers for
+MAX_SLOT_RANGE = timedelta(days=366)
+
+SHOW_COLUMNS = {
+    'id': Show.id,
+    'start_time': Show.start_time,
+    'duration_minutes': Show.duration_minutes,
+    'artist_id': Show.artist_id,
+    'artist_name': Artist.name.label('artist_name'),
+    'artist_image_link': Artist.image_link.label('artist_image_link'),
+    'venue_id': Show.venue_id,
+    'venue_name': Venue.name.label('venue_name'),
+    'venue_image_link': Venue.image_link.label('venue_image_link'),
+}
+
+
+class ApiError(Exception):
+
+    def __init__(self, message, status=400):
+        Exception.__init__(self, message)
+        self.status = status
+
+
+def _default(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(repr(value))
+
+
+def dumps(data):
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, default=_default, separators=(',', ':'))
+
+
+def json_response(data, status=200):
+    return Response(dumps(data), status=status, mimetype='application/json')
+
+
+def selected_fields(available):
+    # the ?fields= list, in the order given, checked against what the resource has
+    fields = request.args.get('fields')
+    if not fields:
+        return list(available)
+    fields = [field.strip() for field in fields.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in available]
+    if unknown or not fields:
+        raise ApiError('unknown field(s) %s; choose from %s' % (', '.join(unknown) or '(none)', ', '.join(available)))
+    return list(dict.fromkeys(fields))
+
+
+def entity_query(model, fields, keys=()):
+    # the requested columns plus any sort keys the cursor needs
+    names = [field for field in fields if field != 'genres'] + [key.key for key in keys]
+    return db.session.query(*[getattr(model, name) for name in dict.fromkeys(names)])
+
+
+def genre_names(model, ids):
+    # genre names for a page of ids with one query on the association table
+    link = artist_genre if model is Artist else venue_genre
+    owner = link.c.artist_id if model is Artist else link.c.venue_id
+    genres = dict((id, []) for id in ids)
+    if ids:
+        for id, name in db.session.query(owner, Genre.name).join(
+            Genre, Genre.id == link.c.genre_id
+        ).filter(owner.in_(ids)).order_by(owner, Genre.name):
+            genres[id].append(name)
+    return genres
+
+
+def records(model, rows, fields):
+    # result rows -> dicts holding just the requested fields
+    genres = genre_names(model, [row.id for row in rows]) if 'genres' in fields else {}
+    return [
+        dict((field, genres[row.id] if field == 'genres' else getattr(row, field)) for field in fields)
+        for row in rows
+    ]
+
+
+def datetime_arg(name, default):
+    value = request.args.get(name)
+    if not value:
+        return default
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ApiError('%s must be an ISO date or datetime' % name)
+
+
+def page_response(page, data):
+    return json_response({'data': data, 'next': page.next_cursor, 'prev': page.prev_cursor})
+
+
+def entity_list(model, fields_available, keys):
+    fields = selected_fields(fields_available)
+    # genres need the id to attach them to
+    query = entity_query(model, fields + (['id'] if 'genres' in fields else []), keys)
+    query = with_genre(query, model, request.args.get('genre'))
+    page = keyset_page(query, keys, **page_args())
+    return page_response(page, records(model, page.items, fields))
+
+
+def entity_detail(model, fields_available, id):
+    fields = selected_fields(fields_available)
+    row = entity_query(model, fields + ['id']).filter(model.id == id).first()
+    if row is None:
+        abort(404)
+    return json_response({'data': records(model, [row], fields)[0]})
+
+
+def entity_search(model, fields_available):
+    fields = selected_fields(fields_available)
+    ranked = search.search(model, request.args.get('q', ''))
+    page = ranked_page(ranked, **page_args())
+    ids = [id for _, _, id in page.items]
+    rows = {}
+    if ids:
+        rows = dict((row.id, row) for row in entity_query(model, fields + ['id']).filter(model.id.in_(ids)))
+    data = records(model, [rows[id] for id in ids if id in rows], fields)
+    return json_response({'count': len(ranked), 'data': data, 'next': page.next_cursor, 'prev': page.prev_cursor})
+
+
+@api.route('/artists')
+def artists():
+    return entity_list(Artist, ARTIST_FIELDS, ARTIST_KEYS)
+
+
+@api.route('/artists/<int:artist_id>')
+def artist(artist_id):
+    return entity_detail(Artist, ARTIST_FIELDS, artist_id)
+
+
+@api.route('/venues')
+def venues():
+    return entity_list(Venue, VENUE_FIELDS, VENUE_AREA_KEYS)
+
+
+@api.route('/venues/<int:venue_id>')
+def venue(venue_id):
+    return entity_detail(Venue, VENUE_FIELDS, venue_id)
+
+
+@api.route('/venues/<int:venue_id>/free-slots')
+def venue_free_slots(venue_id):
+    # gaps between the venue's shows, this month unless ?from=/?to= (ISO
+    # dates or datetimes) say otherwise; ?min_minutes= drops shorter gaps
+    if not db.session.query(Venue.id).filter(Venue.id == venue_id).first():
+        abort(404)
+    today = date.today()
+    month = datetime(today.year, today.month, 1)
+    start = datetime_arg('from', month)
+    end = datetime_arg('to', datetime(month.year + month.month // 12, month.month % 12 + 1, 1))
+    if end <= start or end - start > MAX_SLOT_RANGE:
+        raise ApiError('to must be after from and at most %d days later' % MAX_SLOT_RANGE.days)
+    min_minutes = request.args.get('min_minutes', '60')
+    if not min_minutes.isdigit() or not 0 < int(min_minutes) <= 60 * 24 * 366:
+        raise ApiError('min_minutes must be a positive integer')
+    slots = free_slots(venue_id, start, end, int(min_minutes))
+    return json_response({'data': [{'start': slot_start, 'end': slot_end} for slot_start, slot_end in slots]})
+
+
+@api.route('/shows')
+def shows():
+    # all shows by start time; ?artist_id= / ?venue_id= narrow them on the
+    # (artist_id, start_time) / (venue_id, start_time) indexes
+    fields = selected_fields(SHOW_COLUMNS)
+    names = list(dict.fromkeys(fields + [key.key for key in SHOW_KEYS]))
+    query = db.session.query(*[SHOW_COLUMNS[name] for name in names]).select_from(Show)
+    if any(name.startswith('artist_') and name != 'artist_id' for name in names):
+        query = query.join(Artist, Show.artist_id == Artist.id)
+    if any(name.startswith('venue_') and name != 'venue_id' for name in names):
+        query = query.join(Venue, Show.venue_id == Venue.id)
+    for name in ('artist_id', 'venue_id'):
+        value = request.args.get(name)
+        if value is not None:
+            if not value.isdigit():
+                raise ApiError('%s must be an integer' % name)
+            query = query.filter(SHOW_COLUMNS[name] == int(value))
+    page = keyset_page(query, SHOW_KEYS, **page_args())
+    return page_response(page, [dict((field, getattr(row, field)) for field in fields) for row in page.items])
+
+
+@api.route('/search/artists')
+def search_artists():
+    return entity_search(Artist, ARTIST_FIELDS)
+
+
+@api.route('/search/venues')
+def search_venues():
+    return entity_search(Venue, VENUE_FIELDS)
+
+
+@api.errorhandler(ApiError)
+def api_error(error):
+    return json_response({'error': str(error)}, error.status)
+
+
+@api.errorhandler(InvalidCursor)
+def invalid_cursor(error):
+    return json_response({'error': 'invalid cursor'}, 400)
+
+
+@api.errorhandler(404)
+def not_found(error):
+    return json_response({'error': 'not found'}, 404)
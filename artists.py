@@ -0,0 +1,243 @@
+from flask import Blueprint, render_template, request, flash, redirect, url_for, abort, current_app
+
+from async_database import load_profile as load_profile_async
+from cache import entity_cache
+from counters import remove_shows
+from dates import format_datetimes
+from models import db, Artist, Venue, Show, Genre
+from pagecache import expire_page
+from pagination import keyset_page, ranked_page, page_args
+from profiles import load_profile
+from queries import with_genre, ARTIST_KEYS
+import search
+
+bp = Blueprint('artists', __name__)
+
+#  Artists
+#  ----------------------------------------------------------------
+@bp.route('/artists')
+def artists():
+  # TODO: replace with real data returned from querying the database
+  #status: done
+  genre = request.args.get('genre')
+  page = keyset_page(with_genre(Artist.query, Artist, genre), ARTIST_KEYS, **page_args())
+  return render_template('pages/artists.html', artists=page.items, page=page, genre=genre)
+
+@bp.route('/artists/search', methods=['GET', 'POST'])
+def search_artists():
+  # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
+  # status: done
+  # #get the search term and rank artists on name, city and genres through the search index
+  search_term = request.values.get('search_term', '')
+  ranked = search.search(Artist, search_term)
+  page = ranked_page(ranked, **page_args())
+  results = search.load_ranked(Artist, page.items)
+  #count the number of related searches and append the data like search term
+  response = {
+    "count": len(ranked),
+    "data": [{
+      "id": result.id,
+      "name": result.name,
+      "num_upcoming_shows": result.upcoming_shows_count
+    } for result in results]
+  }
+  return render_template('pages/search_artists.html', results=response, search_term=search_term, page=page)
+
+@bp.route('/artists/<int:artist_id>')
+def show_artist(artist_id):
+  # shows the artist page with the given artist_id
+  # TODO: replace with real artist data from the artist table, using artist_id
+  #Status: done
+  # the artist (through the entity cache) and all of its shows in one query,
+  # split into upcoming and past shows in a single pass
+  profile = load_profile(Artist, artist_id, current_app.config['PROFILE_PAST_SHOWS'])
+  if profile is None:
+    abort(404)
+  return render_artist(profile)
+
+async def show_artist_async(artist_id):
+  # the same page read through the async engine (ASYNC_PROFILES); create_app()
+  # routes show_artist here
+  profile = await load_profile_async(Artist, artist_id, current_app.config['PROFILE_PAST_SHOWS'])
+  if profile is None:
+    abort(404)
+  return render_artist(profile)
+
+def render_artist(profile):
+  artist_data = profile.entity
+  if profile.upcoming:
+    # a cached copy of the page is stale once the soonest upcoming show starts
+    expire_page(profile.upcoming[0][0])
+  #iterate through and append the required rows to their matching columns
+  upcoming_shows = []
+  start_times = format_datetimes([row[0] for row in profile.upcoming], 'full')
+  for (_, venue_id, venue_name, image_link), start_time in zip(profile.upcoming, start_times):
+    upcoming_shows.append(
+      {
+        "venue_id": venue_id,
+        "venue_name": venue_name,
+        "venue_image_link": image_link,
+        "start_time": start_time
+      }
+    )
+
+  past_shows = []
+  start_times = format_datetimes([row[0] for row in profile.past], 'full')
+  for (_, venue_id, venue_name, image_link), start_time in zip(profile.past, start_times):
+    past_shows.append(
+      {
+        "venue_id": venue_id,
+        "venue_name": venue_name,
+        "venue_image_link": image_link,
+        "start_time": start_time
+      }
+    )
+  #assign data and specify the past/upcoming show count using len
+  data={
+    "id": artist_data.id,
+    "name":artist_data.name,
+    "genres":artist_data.genre_names,
+    "city":artist_data.city,
+    "state":artist_data.state,
+    "phone":artist_data.phone,
+    "website":artist_data.website,
+    "facebook_link":artist_data.facebook_link,
+    "seeking_venue":artist_data.seeking_venue,
+    "seeking_description":artist_data.seeking_description,
+    "image_link":artist_data.image_link,
+    "past_shows": past_shows,
+    "upcoming_shows": upcoming_shows,
+    "past_shows_count": profile.past_count,
+    "upcoming_shows_count": profile.upcoming_count,
+  }
+
+  return render_template('pages/show_artist.html', artist=data)
+
+
+
+#  Update
+#  ----------------------------------------------------------------
+@bp.route('/artists/<int:artist_id>/edit', methods=['GET'])
+def edit_artist(artist_id):
+  from forms import ArtistForm
+  form = ArtistForm()
+  #retrieve data from the entity cache using the artist id
+  artist = entity_cache.get(Artist, artist_id)
+  if artist is None:
+    abort(404)
+  form.name.process_data(artist.name)
+  form.genres.process_data(artist.genre_names)
+  form.city.process_data(artist.city)
+  form.state.process_data(artist.state)
+  form.phone.process_data(artist.phone)
+  form.website_link.process_data(artist.website)
+  form.facebook_link.process_data(artist.facebook_link)
+  form.seeking_venue.process_data(artist.seeking_venue)
+  form.seeking_description.process_data(artist.seeking_description)
+  form.image_link.process_data(artist.image_link)
+  
+  # TODO: populate form with fields from artist with ID <artist_id>
+  #status: done
+  return render_template('forms/edit_artist.html', form=form, artist=artist)
+
+@bp.route('/artists/<int:artist_id>/edit', methods=['POST'])
+def edit_artist_submission(artist_id):
+  from forms import ArtistForm
+  # TODO: take values from the form submitted, and update existing
+  # artist record with ID <artist_id> using the new attributes
+  #status: done
+  #update Artist form with new input
+  form =ArtistForm(request.form) 
+  try:
+    artist = Artist.query.get(artist_id)
+    artist.name = form.name.data
+    artist.genres = Genre.named(form.genres.data)
+    artist.city = form.city.data
+    artist.state = form.state.data
+    artist.phone = form.phone.data
+    artist.website = form.website_link.data
+    artist.facebook_link = form.facebook_link.data
+    artist.seeking_venue = form.seeking_venue.data
+    artist.seeking_description = form.seeking_description.data
+    artist.image_link = form.image_link.data
+    # if successful add new data and commit session
+    db.session.add(artist)
+    db.session.commit()
+    entity_cache.invalidate(Artist, artist_id)
+    flash('Artist ' + artist.name + ' updated successfully!')
+
+  except Exception as err:
+    db.session.rollback()
+    flash('Error updating artist ' + artist.name + str(err))
+  finally:
+    db.session.close()
+  return redirect(url_for('artists.show_artist', artist_id=artist_id))
+#  Create Artist
+#  ----------------------------------------------------------------
+
+@bp.route('/artists/create', methods=['GET'])
+def create_artist_form():
+  from forms import ArtistForm
+  form = ArtistForm()
+  return render_template('forms/new_artist.html', form=form)
+
+@bp.route('/artists/create', methods=['POST'])
+def create_artist_submission():
+  from forms import ArtistForm
+  # called upon submitting the new artist listing form
+  # TODO: insert form data as a new Venue record in the db, instead
+  # TODO: modify data to be the data object returned from db insertion
+  #status: done
+  try:
+    # create new data using form input, I requested form so I could look up the genres
+    form = ArtistForm(request.form)
+    artist = Artist(
+      name=form.name.data,
+      city=form.city.data,
+      genres=Genre.named(form.genres.data),
+      state=form.state.data,
+      phone=form.phone.data,
+      image_link=form.image_link.data,
+      seeking_description=form.seeking_description.data,
+      seeking_venue=form.seeking_venue.data,
+      website=form.website_link.data,
+      facebook_link=form.facebook_link.data
+    )
+    # add new data and commit session
+    db.session.add(artist)
+    db.session.commit()
+    flash('Artist ' + artist.name + ' was successfully listed!')
+  
+  except Exception as err:
+    flash('Error adding ' + artist.name + str(err))
+    db.session.rollback()
+  finally:
+    db.session.close()
+  return render_template('pages/home.html')
+  # on successful db insert, flash success
+  #flash('Artist ' + request.form['name'] + ' was successfully listed!')
+  # TODO: on unsuccessful db insert, flash an error instead.
+  # e.g., flash('An error occurred. Artist ' + data.name + ' could not be listed.')
+  #return render_template('pages/home.html')
+
+@bp.route('/artists/<int:artist_id>/delete', methods=['POST'])
+def delete_artist(artist_id):
+
+  # query the artist id and delete all data related to said id,
+  # taking its shows off the counters of the venues that hosted them
+  try:
+    artist = Artist.query.get(artist_id)
+    touched = remove_shows(Show.artist_id == artist_id)
+    db.session.delete(artist)
+    db.session.commit()
+    entity_cache.invalidate(Artist, artist_id)
+    entity_cache.invalidate(Venue, *touched[Venue])
+    flash('Artist ' + artist.name + ' has been deleted successfully')
+    
+  except Exception as err:
+    flash('Error!' + artist.name + ' was not deleted')
+    db.session.rollback()
+  finally:
+    db.session.close()
+  
+  return render_template('pages/home.html')
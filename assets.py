@@ -0,0 +1,167 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import shutil
+
+from flask import abort, current_app, request, send_from_directory, url_for
+from werkzeug.local import LocalProxy
+from werkzeug.security import safe_join
+
+# Fingerprinted, precompressed static files. `flask build-assets` copies
+# everything under static/ to ASSETS_FOLDER as name.<content hash>.ext, with
+# .gz (and, when the brotli package is installed, .br) next to each file that
+# compresses well, and writes manifest.json mapping static paths to the
+# hashed ones. url() references in CSS and sourceMappingURL comments are
+# rewritten to the hashed names first, so a stylesheet's hash changes with
+# the fonts and images it uses.
+#
+# static_url('css/main.css') in a template gives the hashed URL under
+# /assets/, served with a year-long immutable Cache-Control and the .br or
+# .gz variant the client accepts. Files missing from the manifest (or every
+# file, before the first build) fall back to Flask's /static/ handler.
+
+MANIFEST = 'manifest.json'
+HASH_LENGTH = 12
+# already compressed; gzip and brotli would only add bytes
+COMPRESSED = {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.woff', '.woff2', '.gz', '.br', '.zip'}
+# keep a variant only if it is at most this fraction of the original
+MIN_SAVING = 0.9
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+ONE_YEAR = 365 * 24 * 3600
+
+CSS_URL = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+SOURCE_MAP = re.compile(r'(sourceMappingURL=)(\S+)')
+
+
+def hashed_name(path, content):
+    digest = hashlib.sha256(content).hexdigest()[:HASH_LENGTH]
+    base, ext = posixpath.splitext(path)
+    return '%s.%s%s' % (base, digest, ext)
+
+
+def rewrite_references(path, content, manifest):
+    # point relative url()s and source maps in a CSS or JS file at hashed names
+    directory = posixpath.dirname(path)
+
+    def hashed(reference):
+        target, suffix = re.match(r'([^?#]*)(.*)', reference).groups()
+        if not target or ':' in target or target.startswith('/'):
+            return reference
+        resolved = posixpath.normpath(posixpath.join(directory, target))
+        if resolved not in manifest:
+            return reference
+        return posixpath.relpath(manifest[resolved], directory) + suffix
+
+    text = content.decode('utf-8')
+    if path.endswith('.css'):
+        text = CSS_URL.sub(lambda m: 'url(%s%s%s)' % (m.group(1), hashed(m.group(2)), m.group(1)), text)
+    text = SOURCE_MAP.sub(lambda m: m.group(1) + hashed(m.group(2)), text)
+    return text.encode('utf-8')
+
+
+def compressors():
+    found = [('.gz', lambda data: gzip.compress(data, 9, mtime=0))]
+    try:
+        import brotli
+    except ImportError:
+        return found
+    return found + [('.br', lambda data: brotli.compress(data, quality=11))]
+
+
+def source_files(static_folder):
+    # static paths (with /) of every file to build; maps and other plain
+    # files first, then JS and CSS, which may refer to them
+    paths = []
+    for root, dirs, files in os.walk(static_folder):
+        dirs.sort()
+        for name in sorted(files):
+            if not name.startswith('.'):
+                paths.append(os.path.relpath(os.path.join(root, name), static_folder).replace(os.sep, '/'))
+    return sorted(paths, key=lambda path: (path.endswith(('.css', '.js')), path))
+
+
+def build(static_folder, assets_folder):
+    # rebuild assets_folder from static_folder; returns (files, bytes written)
+    if os.path.isdir(assets_folder):
+        shutil.rmtree(assets_folder)
+    os.makedirs(assets_folder)
+    manifest, written = {}, 0
+    encoders = compressors()
+    for path in source_files(static_folder):
+        with open(os.path.join(static_folder, path), 'rb') as f:
+            content = f.read()
+        if path.endswith(('.css', '.js')):
+            content = rewrite_references(path, content, manifest)
+        manifest[path] = hashed_name(path, content)
+        target = os.path.join(assets_folder, manifest[path])
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        outputs = [(target, content)]
+        if posixpath.splitext(path)[1].lower() not in COMPRESSED:
+            for suffix, compress in encoders:
+                compressed = compress(content)
+                if len(compressed) <= len(content) * MIN_SAVING:
+                    outputs.append((target + suffix, compressed))
+        for filename, data in outputs:
+            with open(filename, 'wb') as f:
+                f.write(data)
+            written += len(data)
+    with open(os.path.join(assets_folder, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    return len(manifest), written
+
+
+class Assets(object):
+
+    def __init__(self):
+        self.manifest = {}
+        self.folder = None
+
+    def init_app(self, app):
+        app.config.setdefault('ASSETS_FOLDER', os.path.join(app.root_path, 'build', 'assets'))
+        app.config.setdefault('ASSETS_URL_PATH', '/assets')
+        self.folder = app.config['ASSETS_FOLDER']
+        self.load()
+        app.add_url_rule(app.config['ASSETS_URL_PATH'] + '/<path:filename>', 'assets', self.serve)
+        app.add_template_global(self.static_url, 'static_url')
+        app.extensions['assets'] = self
+
+    def load(self):
+        # the manifest of the last build, read once at startup
+        try:
+            with open(os.path.join(self.folder, MANIFEST)) as f:
+                self.manifest = json.load(f)
+        except (IOError, ValueError):
+            self.manifest = {}
+
+    def static_url(self, filename):
+        hashed = self.manifest.get(filename)
+        if hashed is None:
+            return url_for('static', filename=filename)
+        return url_for('assets', filename=hashed)
+
+    def serve(self, filename):
+        # the hashed file itself or its best precompressed variant
+        path = safe_join(self.folder, filename)
+        if path is None:
+            abort(404)
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        encoding, suffix = None, ''
+        for name, variant in ENCODINGS:
+            if request.accept_encodings[name] and os.path.isfile(path + variant):
+                encoding, suffix = name, variant
+                break
+        response = send_from_directory(self.folder, filename + suffix, mimetype=mimetype, max_age=ONE_YEAR)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        response.headers['Vary'] = 'Accept-Encoding'
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+
+# the current app's built assets, configured by create_app()
+assets = LocalProxy(lambda: current_app.extensions['assets'])
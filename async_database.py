@@ -0,0 +1,126 @@
+import asyncio
+import os
+import threading
+import weakref
+
+from flask import current_app
+from sqlalchemy.engine import make_url
+from werkzeug.local import LocalProxy
+
+from profiles import profile_query, build_profile
+
+# Async reads for the profile pages (ASYNC_PROFILES), on a SQLAlchemy asyncio
+# engine (asyncpg on Postgres, aiosqlite on SQLite). A venue or artist page
+# is one statement (see profiles.py); the view awaits it instead of blocking
+# its worker thread on the database.
+#
+# Flask runs every async view on a new event loop, while asyncio connections
+# belong to the loop that opened them. The engine therefore lives on one
+# long-lived loop in a background thread, where its pool is reused across
+# requests, and views await their statements on it. Every app has its own
+# engine and loop.
+
+DRIVERS = {
+    'postgresql': 'postgresql+asyncpg',
+    'sqlite': 'sqlite+aiosqlite',
+}
+
+# every AsyncDatabase in the process, to reset after a fork
+DATABASES = weakref.WeakSet()
+
+
+def async_url(url, root_path=None):
+    # the async driver's URL for a database URL; relative SQLite paths resolve
+    # against the app root the way Flask-SQLAlchemy resolves them
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in DRIVERS:
+        raise ValueError('no async driver for %s databases' % backend)
+    url = url.set(drivername=DRIVERS[backend])
+    if backend == 'sqlite' and url.database and url.database != ':memory:' and not os.path.isabs(url.database):
+        url = url.set(database=os.path.join(root_path or '', url.database))
+    return url
+
+
+def engine_options(url, config):
+    # the pool limits and statement timeout config.py sets for the sync engine
+    if url.get_backend_name() != 'postgresql':
+        return {}
+    options = {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+    }
+    if config['DB_STATEMENT_TIMEOUT']:
+        options['connect_args'] = {'server_settings': {'statement_timeout': str(config['DB_STATEMENT_TIMEOUT'])}}
+    return options
+
+
+class AsyncDatabase(object):
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.url = None
+        self.options = {}
+        self.loop = None
+        self.engine = None
+        DATABASES.add(self)
+
+    def init_app(self, app):
+        config = app.config
+        config.setdefault('ASYNC_PROFILES', False)
+        config.setdefault('ASYNC_DATABASE_URI', None)
+        if config['ASYNC_PROFILES']:
+            self.url = async_url(config['ASYNC_DATABASE_URI'] or config['SQLALCHEMY_DATABASE_URI'], app.root_path)
+            self.options = engine_options(self.url, config)
+        app.extensions['async_db'] = self
+
+    def start(self):
+        # the engine's loop, started on first use
+        with self.lock:
+            if self.loop is None:
+                from sqlalchemy.ext.asyncio import create_async_engine
+                self.engine = create_async_engine(self.url, **self.options)
+                self.loop = asyncio.new_event_loop()
+                threading.Thread(target=self.loop.run_forever, name='async-db', daemon=True).start()
+            return self.loop
+
+    def reset(self):
+        # after a fork the loop thread is gone; forget the engine without
+        # closing the parent's connections and start afresh on next use
+        if self.engine is not None:
+            self.engine.sync_engine.dispose(close=False)
+        self.lock = threading.Lock()
+        self.loop = None
+        self.engine = None
+
+    async def execute(self, statement):
+        async with self.engine.connect() as connection:
+            result = await connection.execute(statement)
+            return result.all()
+
+    async def fetch(self, statement):
+        # the statement's rows, read on the engine's loop
+        future = asyncio.run_coroutine_threadsafe(self.execute(statement), self.start())
+        return await asyncio.wrap_future(future)
+
+
+# the current app's async engine, configured by create_app()
+async_db = LocalProxy(lambda: current_app.extensions['async_db'])
+
+
+def _reset_after_fork():
+    for database in list(DATABASES):
+        database.reset()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+async def load_profile(model, id, past_limit=None):
+    # profiles.load_profile() on the async engine
+    entity, statement = profile_query(model, id, past_limit)
+    return build_profile(model, id, entity, await async_db.fetch(statement))
@@ -0,0 +1,222 @@
+import random
+from datetime import timedelta
+
+from sqlalchemy import or_
+
+from models import db, Show, MAX_SHOW_MINUTES
+
+# Booking conflicts: no two shows of one artist, or of one venue, may
+# overlap. On Postgres the `during` range column's exclusion constraints
+# guarantee it within each month partition (see partitions.py); the checks
+# here give a readable error before the insert, catch shows that cross into
+# the next month and cover SQLite. A show lasts at most MAX_SHOW_MINUTES, so everything that can
+# overlap [start, end) starts in (start - MAX_SHOW_MINUTES, end): one range
+# scan on the (venue_id, start_time) / (artist_id, start_time) indexes.
+# Imports check against an in-memory IntervalTree per artist and venue.
+
+MAX_SHOW = timedelta(minutes=MAX_SHOW_MINUTES)
+
+
+class BookingConflict(Exception):
+
+    def __init__(self, conflicts):
+        Exception.__init__(self, '; '.join(describe(conflict) for conflict in conflicts))
+        self.conflicts = conflicts
+
+
+def describe(conflict):
+    # conflict is (kind, id, start, end) for the show already booked
+    kind, id, start, end = conflict
+    return 'the %s is booked from %s to %s' % (kind, start.strftime('%Y-%m-%d %H:%M'), end.strftime('%Y-%m-%d %H:%M'))
+
+
+def is_conflict_error(error):
+    # the IntegrityError Postgres raises for an exclusion constraint
+    return getattr(getattr(error, 'orig', None), 'pgcode', None) == '23P01'
+
+
+class _Node(object):
+    __slots__ = ('start', 'end', 'value', 'priority', 'left', 'right', 'max_end')
+
+    def __init__(self, start, end, value, priority):
+        self.start = start
+        self.end = end
+        self.value = value
+        self.priority = priority
+        self.left = None
+        self.right = None
+        self.max_end = end
+
+
+class IntervalTree(object):
+    # half-open [start, end) intervals in a treap ordered by start, each node
+    # also holding the latest end below it, so an overlap query skips every
+    # subtree that ends before the query starts. Random priorities keep it
+    # balanced even when intervals arrive in start order, as imports do.
+
+    def __init__(self, seed=0):
+        self.root = None
+        self.size = 0
+        self.random = random.Random(seed)
+
+    def __len__(self):
+        return self.size
+
+    def add(self, start, end, value=None):
+        self.root = self._insert(self.root, _Node(start, end, value, self.random.random()))
+        self.size += 1
+
+    def _insert(self, node, new):
+        if node is None:
+            return new
+        if new.start < node.start:
+            node.left = self._insert(node.left, new)
+            if node.left.priority > node.priority:
+                node = self._rotate_right(node)
+        else:
+            node.right = self._insert(node.right, new)
+            if node.right.priority > node.priority:
+                node = self._rotate_left(node)
+        self._update(node)
+        return node
+
+    @staticmethod
+    def _update(node):
+        node.max_end = node.end
+        for child in (node.left, node.right):
+            if child is not None and child.max_end > node.max_end:
+                node.max_end = child.max_end
+
+    def _rotate_right(self, node):
+        left = node.left
+        node.left, left.right = left.right, node
+        self._update(node)
+        self._update(left)
+        return left
+
+    def _rotate_left(self, node):
+        right = node.right
+        node.right, right.left = right.left, node
+        self._update(node)
+        self._update(right)
+        return right
+
+    def overlapping(self, start, end):
+        # (start, end, value) of every interval overlapping [start, end), by start
+        found = []
+        self._search(self.root, start, end, found)
+        return found
+
+    def _search(self, node, start, end, found):
+        while node is not None and node.max_end > start:
+            self._search(node.left, start, end, found)
+            if node.start >= end:
+                # so does everything to its right
+                return
+            if node.end > start:
+                found.append((node.start, node.end, node.value))
+            node = node.right
+
+
+def booked_query(start, end, venue_id=None, artist_id=None):
+    # shows of the venue and/or artist that may overlap [start, end); callers
+    # drop the ones that end by start
+    owners = []
+    if venue_id is not None:
+        owners.append(Show.venue_id == venue_id)
+    if artist_id is not None:
+        owners.append(Show.artist_id == artist_id)
+    return db.session.query(
+        Show.id, Show.artist_id, Show.venue_id, Show.start_time, Show.duration_minutes
+    ).filter(or_(*owners), Show.start_time > start - MAX_SHOW, Show.start_time < end)
+
+
+def show_end(row):
+    return row.start_time + timedelta(minutes=row.duration_minutes)
+
+
+def find_conflicts(artist_id, venue_id, start, end):
+    # (kind, show id, start, end) for each booked show overlapping [start, end)
+    conflicts = []
+    for row in booked_query(start, end, venue_id=venue_id, artist_id=artist_id).order_by(Show.start_time):
+        if show_end(row) <= start:
+            continue
+        if row.venue_id == venue_id:
+            conflicts.append(('venue', row.id, row.start_time, show_end(row)))
+        if row.artist_id == artist_id:
+            conflicts.append(('artist', row.id, row.start_time, show_end(row)))
+    return conflicts
+
+
+def check_booking(artist_id, venue_id, start, end):
+    conflicts = find_conflicts(artist_id, venue_id, start, end)
+    if conflicts:
+        raise BookingConflict(conflicts)
+
+
+def free_slots(venue_id, start, end, min_minutes=60):
+    # (from, to) gaps of at least min_minutes between the venue's shows in
+    # [start, end), in order
+    slots, free_from = [], start
+    rows = booked_query(start, end, venue_id=venue_id).order_by(Show.start_time)
+    for row in rows:
+        if row.start_time - free_from >= timedelta(minutes=min_minutes):
+            slots.append((free_from, row.start_time))
+        free_from = max(free_from, show_end(row))
+    if end - free_from >= timedelta(minutes=min_minutes):
+        slots.append((free_from, end))
+    return slots
+
+
+class Bookings(object):
+    # IntervalTrees of booked shows per venue and per artist, for checking
+    # many new shows (an import or a tour) without a query per show. A venue
+    # or artist's existing shows are loaded the first time it comes up and
+    # kept until clear().
+
+    def __init__(self):
+        self.trees = {}
+
+    def tree(self, kind, id):
+        key = (kind, id)
+        if key not in self.trees:
+            tree = self.trees[key] = IntervalTree()
+            owner = Show.venue_id if kind == 'venue' else Show.artist_id
+            for row in db.session.query(Show.id, Show.start_time, Show.duration_minutes).filter(owner == id):
+                tree.add(row.start_time, show_end(row), row.id)
+        return self.trees[key]
+
+    def load(self, artist_ids, venue_ids, start, end):
+        # the shows of many artists and venues that may overlap [start, end),
+        # in one query; later checks inside that window need no queries
+        artist_ids, venue_ids = set(artist_ids), set(venue_ids)
+        for kind, ids in (('artist', artist_ids), ('venue', venue_ids)):
+            for id in ids:
+                self.trees[(kind, id)] = IntervalTree()
+        rows = db.session.query(
+            Show.id, Show.artist_id, Show.venue_id, Show.start_time, Show.duration_minutes
+        ).filter(
+            or_(Show.artist_id.in_(artist_ids), Show.venue_id.in_(venue_ids)),
+            Show.start_time > start - MAX_SHOW, Show.start_time < end,
+        )
+        for row in rows:
+            if row.artist_id in artist_ids:
+                self.trees[('artist', row.artist_id)].add(row.start_time, show_end(row), row.id)
+            if row.venue_id in venue_ids:
+                self.trees[('venue', row.venue_id)].add(row.start_time, show_end(row), row.id)
+
+    def conflicts(self, artist_id, venue_id, start, end):
+        return [
+            (kind, value, booked_start, booked_end)
+            for kind, id in (('venue', venue_id), ('artist', artist_id))
+            for booked_start, booked_end, value in self.tree(kind, id).overlapping(start, end)
+        ]
+
+    def clear(self):
+        # drop every tree; the next check reloads from the database whatever
+        # has been committed since
+        self.trees.clear()
+
+    def add(self, artist_id, venue_id, start, end, value=None):
+        self.tree('venue', venue_id).add(start, end, value)
+        self.tree('artist', artist_id).add(start, end, value)
@@ -0,0 +1,53 @@
+# Micro-benchmark for the `datetime` template filter.
+#
+#   python benchmarks/bench_dates.py [number of shows]
+#
+# Compares the original filter (str() -> dateutil -> babel with the pattern
+# re-parsed on every call) against dates.format_datetime and the batch
+# dates.format_datetimes on a list of show start times.
+
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import babel.dates
+import dateutil.parser
+
+from dates import format_datetime, format_datetimes
+
+
+def original_format_datetime(value, format='medium'):
+    date = dateutil.parser.parse(str(value))
+    if format == 'full':
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    elif format == 'medium':
+        format = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format, locale='en')
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    # shows start on the hour, so a long list repeats start times
+    start = datetime(2026, 1, 1, 20, 0)
+    values = [start + timedelta(hours=(i * 7) % 2000) for i in range(count)]
+
+    assert [original_format_datetime(v, 'full') for v in values] == format_datetimes(values, 'full')
+
+    runs = {
+        'original filter': lambda: [original_format_datetime(v, 'full') for v in values],
+        'format_datetime': lambda: [format_datetime(v, 'full') for v in values],
+        'format_datetimes': lambda: format_datetimes(values, 'full'),
+    }
+    baseline = None
+    print('%d start times, best of 5' % count)
+    for name, run in runs.items():
+        best = min(timeit.repeat(run, number=1, repeat=5))
+        baseline = baseline or best
+        print('  %-18s %8.2f ms  %5.1fx' % (name, best * 1000, baseline / best))
+
+
+if __name__ == '__main__':
+    main()
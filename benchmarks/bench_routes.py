@@ -0,0 +1,224 @@
+# Route-level benchmark.
+#
+#   python benchmarks/bench_routes.py --shows 100000
+#   python benchmarks/bench_routes.py --shows 1000000 --database postgresql://localhost/fyyur_bench
+#   python benchmarks/bench_routes.py --shows 100000 --compare benchmarks/results/1a2b3c4.json
+#
+# Seeds a deterministic dataset (benchmarks/seed.py) into a scratch database,
+# times every route in app.py through the Flask test client and reports
+# p50/p95 latency, statements per request and peak Python memory. Results
+# are written to benchmarks/results/<commit>.json so two commits can be
+# compared with --compare. The target database is dropped and recreated.
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from app import create_app
+from seed import seed, scale
+
+
+def cases(sizes):
+    # (name, method, path, form data) for every route; ids point into the
+    # middle of the seeded id ranges so profiles have a typical show history.
+    # Form data may be a function returning it, called per request.
+    artist, venue = sizes['artists'] // 2, sizes['venues'] // 2
+    artist_form = {
+        'name': 'Bench Artist', 'city': 'Austin', 'state': 'TX', 'genres': ['Jazz', 'Funk'],
+        'facebook_link': 'https://www.facebook.com/bench',
+    }
+    venue_form = dict(artist_form, name='Bench Venue', address='1 Bench St')
+    # a new day for every show posted, so none of them is refused as a double booking
+    days = itertools.count()
+    show_form = lambda: {
+        'artist_id': str(artist), 'venue_id': str(venue),
+        'start_time': (datetime(2030, 1, 1, 20) + timedelta(days=next(days))).strftime('%Y-%m-%d %H:%M:%S'),
+    }
+    # a 20-show tour of the artist, also on days no other show has
+    tour_form = lambda: {'shows': '\n'.join(
+        '%d, %d, %s' % (artist, venue, (datetime(2030, 1, 1, 20) + timedelta(days=next(days))).strftime('%Y-%m-%d %H:%M'))
+        for _ in range(20)
+    )}
+    return [
+        ('index', 'GET', '/', None),
+        ('venues.venues', 'GET', '/venues', None),
+        ('venues.venues?genre', 'GET', '/venues?genre=Jazz', None),
+        ('artists.artists', 'GET', '/artists', None),
+        ('artists.artists?genre', 'GET', '/artists?genre=Jazz', None),
+        ('shows.shows', 'GET', '/shows', None),
+        ('venues.search_venues', 'POST', '/venues/search', {'search_term': 'blue'}),
+        ('artists.search_artists', 'POST', '/artists/search', {'search_term': 'blue'}),
+        ('venues.show_venue', 'GET', '/venues/%d' % venue, None),
+        ('artists.show_artist', 'GET', '/artists/%d' % artist, None),
+        ('venues.create_venue_form', 'GET', '/venues/create', None),
+        ('artists.create_artist_form', 'GET', '/artists/create', None),
+        ('shows.create_shows', 'GET', '/shows/create', None),
+        ('venues.edit_venue', 'GET', '/venues/%d/edit' % venue, None),
+        ('artists.edit_artist', 'GET', '/artists/%d/edit' % artist, None),
+        ('venues.edit_venue_submission', 'POST', '/venues/%d/edit' % venue, venue_form),
+        ('artists.edit_artist_submission', 'POST', '/artists/%d/edit' % artist, artist_form),
+        ('venues.create_venue_submission', 'POST', '/venues/create', venue_form),
+        ('artists.create_artist_submission', 'POST', '/artists/create', artist_form),
+        ('shows.create_show_submission', 'POST', '/shows/create', show_form),
+        ('shows.create_tour_form', 'GET', '/shows/tour', None),
+        ('shows.create_tour_submission', 'POST', '/shows/tour', tour_form),
+        ('export_table', 'GET', '/export/shows.csv', None),
+        ('export_table?artists', 'GET', '/export/artists.jsonl', None),
+        ('api.artists', 'GET', '/api/v1/artists', None),
+        ('api.artists?fields', 'GET', '/api/v1/artists?fields=id,name', None),
+        ('api.artist', 'GET', '/api/v1/artists/%d' % artist, None),
+        ('api.venues', 'GET', '/api/v1/venues', None),
+        ('api.venue', 'GET', '/api/v1/venues/%d' % venue, None),
+        ('api.venue_free_slots', 'GET', '/api/v1/venues/%d/free-slots' % venue, None),
+        ('api.shows', 'GET', '/api/v1/shows', None),
+        ('api.shows?artist_id', 'GET', '/api/v1/shows?artist_id=%d' % artist, None),
+        ('api.search_artists', 'GET', '/api/v1/search/artists?q=blue', None),
+        ('api.search_venues', 'GET', '/api/v1/search/venues?q=blue', None),
+        ('cache_stats', 'GET', '/cache/stats', None),
+        ('metrics', 'GET', '/metrics', None),
+    ]
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def statements(response):
+    # the instrumentation's Server-Timing header carries the statement count
+    timing = response.headers.get('Server-Timing', '')
+    marker = 'desc="'
+    if marker not in timing:
+        return None
+    return int(timing.split(marker, 1)[1].split(' ', 1)[0])
+
+
+def run(client, method, path, data):
+    if method == 'GET':
+        return client.get(path)
+    return client.post(path, data=data() if callable(data) else data)
+
+
+def bench(client, case, requests):
+    name, method, path, data = case
+    run(client, method, path, data)  # warm caches and templates
+
+    timings, counts = [], []
+    for _ in range(requests):
+        started = time.perf_counter()
+        response = run(client, method, path, data)
+        response.get_data()
+        timings.append(time.perf_counter() - started)
+        counts.append(statements(response))
+
+    # one extra request under tracemalloc for the allocation peak
+    tracemalloc.start()
+    run(client, method, path, data).get_data()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        'status': response.status_code,
+        'p50_ms': round(percentile(timings, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(timings, 0.95) * 1000, 3),
+        'statements': max(counts) if None not in counts else None,
+        'peak_kb': round(peak / 1024.0, 1),
+    }
+
+
+def commit_id():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(results, path):
+    with open(path) as f:
+        before = json.load(f)
+    print('\ncompared with %s (%s):' % (before['commit'], path))
+    print('  %-32s %10s %10s %8s' % ('route', 'p50 before', 'p50 now', 'change'))
+    for name, now in results['routes'].items():
+        old = before['routes'].get(name)
+        if old is None:
+            continue
+        change = (now['p50_ms'] - old['p50_ms']) / old['p50_ms'] * 100 if old['p50_ms'] else 0.0
+        print('  %-32s %10.2f %10.2f %+7.1f%%' % (name, old['p50_ms'], now['p50_ms'], change))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time every Fyyur route on a seeded dataset.')
+    parser.add_argument('--shows', type=int, default=1000, help='dataset scale, e.g. 1000, 100000, 1000000')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--database', default='sqlite:///' + os.path.join(ROOT, 'benchmarks', 'bench.db'),
+                        help='scratch database URL; it is dropped and reseeded')
+    parser.add_argument('--requests', type=int, default=30, help='timed requests per route')
+    parser.add_argument('--output', help='results file (default benchmarks/results/<commit>.json)')
+    parser.add_argument('--compare', help='earlier results file to compare against')
+    parser.add_argument('--page-cache', action='store_true',
+                        help='leave the page cache on (by default pages are rendered on every request)')
+    args = parser.parse_args()
+
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': args.database,
+        'WTF_CSRF_ENABLED': False,
+        'PAGE_CACHE': args.page_cache,
+    })
+    app.logger.disabled = True
+
+    with app.app_context():
+        started = time.perf_counter()
+        sizes = seed(args.shows, seed=args.seed)
+        print('seeded %(shows)d shows, %(artists)d artists, %(venues)d venues' % sizes
+              + ' in %.1fs' % (time.perf_counter() - started))
+
+    routes = {}
+    covered = set()
+    client = app.test_client()
+    print('  %-32s %6s %9s %9s %6s %9s' % ('route', 'status', 'p50 ms', 'p95 ms', 'stmts', 'peak KB'))
+    for case in cases(sizes):
+        result = bench(client, case, args.requests)
+        routes[case[0]] = result
+        covered.add(case[0].split('?')[0])
+        print('  %-32s %6d %9.2f %9.2f %6s %9.1f' % (
+            case[0], result['status'], result['p50_ms'], result['p95_ms'],
+            result['statements'], result['peak_kb']))
+
+    # static files, and the fingerprinted ones `flask build-assets` makes
+    missing = set(rule.endpoint for rule in app.url_map.iter_rules()) - covered - set(['static', 'assets'])
+    missing -= set(['venues.delete_venue', 'artists.delete_artist'])  # destructive; not timed
+    if missing:
+        print('not benchmarked: ' + ', '.join(sorted(missing)))
+
+    results = {
+        'commit': commit_id(),
+        'database': args.database.split(':', 1)[0],
+        'scale': scale(args.shows),
+        'requests': args.requests,
+        'python': platform.python_version(),
+        'routes': routes,
+    }
+    output = args.output or os.path.join(ROOT, 'benchmarks', 'results', results['commit'] + '.json')
+    if not os.path.isdir(os.path.dirname(output)):
+        os.makedirs(os.path.dirname(output))
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    print('results written to ' + output)
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
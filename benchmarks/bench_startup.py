@@ -0,0 +1,113 @@
+# Cold start benchmark.
+#
+#   python benchmarks/bench_startup.py
+#   python benchmarks/bench_startup.py --runs 20 --importtime
+#
+# Starts a fresh interpreter per run and times three phases: importing
+# app.py, create_app(), and the first request to each path (the database
+# connection and template compilation happen on that first request).
+# Reports the median and the slowest run. --importtime also lists the
+# slowest imports app.py makes, from `python -X importtime`.
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+PATHS = ['/', '/venues', '/artists/1', '/api/v1/shows']
+
+# run in the child interpreter; argv[1] is the database URL, argv[2:] the paths
+CHILD = '''
+import json, sys, time
+started = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app({'SQLALCHEMY_DATABASE_URI': sys.argv[1]})
+app.logger.disabled = True
+created = time.perf_counter()
+client = app.test_client()
+first = {}
+for path in sys.argv[2:]:
+    before = time.perf_counter()
+    response = client.get(path)
+    response.get_data()
+    first[path] = (time.perf_counter() - before) * 1000
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'first_request_ms': first,
+    'modules': len(sys.modules),
+}))
+'''
+
+
+def child(database, paths, *flags):
+    return subprocess.run(
+        [sys.executable] + list(flags) + ['-c', CHILD, database] + paths,
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+
+
+def median(values):
+    ordered = sorted(values)
+    return ordered[len(ordered) // 2]
+
+
+def slowest_imports(database, paths, count):
+    # what app.py and the first requests import directly, from -X importtime
+    # lines "import time: self | cumulative | name" (name indented by depth)
+    rows = []
+    for line in child(database, paths, '-X', 'importtime').stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip(' ')) - 1) // 2
+        if depth > 1 or name.strip() == 'app':
+            continue
+        rows.append((int(cumulative) / 1000.0, name.strip()))
+    return sorted(rows, reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time Fyyur cold start: import, create_app and first requests.')
+    parser.add_argument('--runs', type=int, default=10, help='fresh interpreters to start')
+    parser.add_argument('--database', default='sqlite:///' + os.path.join(ROOT, 'benchmarks', 'bench.db'),
+                        help='database the first requests read; seeded with 1000 shows if it has no tables')
+    parser.add_argument('--path', action='append', dest='paths', help='path to request (repeatable)')
+    parser.add_argument('--importtime', action='store_true', help='list the slowest imports made by app.py and the requests')
+    args = parser.parse_args()
+    paths = args.paths or PATHS
+
+    from app import create_app
+    from models import db
+    from seed import seed
+    app = create_app({'SQLALCHEMY_DATABASE_URI': args.database})
+    with app.app_context():
+        if not db.engine.dialect.has_table(db.engine.connect(), 'show'):
+            seed(1000)
+
+    runs = [json.loads(child(args.database, paths).stdout) for _ in range(args.runs)]
+    print('%d cold starts, %d modules loaded' % (len(runs), runs[-1]['modules']))
+    print('  %-28s %9s %9s' % ('phase', 'median ms', 'max ms'))
+    for phase in ('import_ms', 'create_app_ms'):
+        values = [run[phase] for run in runs]
+        print('  %-28s %9.1f %9.1f' % (phase[:-3], median(values), max(values)))
+    for path in paths:
+        values = [run['first_request_ms'][path] for run in runs]
+        print('  %-28s %9.1f %9.1f' % ('first GET ' + path, median(values), max(values)))
+    totals = [run['import_ms'] + run['create_app_ms'] + sum(run['first_request_ms'].values()) for run in runs]
+    print('  %-28s %9.1f %9.1f' % ('total', median(totals), max(totals)))
+
+    if args.importtime:
+        print('\nslowest direct imports:')
+        for ms, name in slowest_imports(args.database, paths, 15):
+            print('  %-40s %8.1f ms' % (name, ms))
+
+
+if __name__ == '__main__':
+    main()
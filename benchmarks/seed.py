@@ -0,0 +1,166 @@
+# Deterministic synthetic dataset for the benchmarks.
+#
+# The same (shows, seed) pair always produces the same rows, so timings
+# taken on different commits are comparable. The schema is built by the
+# migrations, as `flask db upgrade` builds it, so Postgres gets the same
+# exclusion constraints, month partitions and table_version rows as
+# production. Rows go in through batched executemany inserts and the show
+# counters are rebuilt at the end.
+
+import os
+import random
+from datetime import date, datetime, timedelta
+
+from flask import current_app
+from flask_migrate import Migrate, upgrade
+from sqlalchemy import MetaData, text
+
+from counters import rebuild_counters
+from models import db, Artist, Venue, Show, Genre, artist_genre, venue_genre
+from partitions import ARCHIVE_SCHEMA, add_months, create_partition, is_partitioned, month_start, partitions
+
+MIGRATIONS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+BATCH_SIZE = 10000
+# shows start in one of these slots a day, at a quarter hour in the slot's
+# first hour, and last at most SHOW_MINUTES[-1], so two shows in different
+# slots never overlap
+SLOT_HOURS = (12, 16, 20)
+SHOW_MINUTES = (60, 90, 120, 150, 180)
+DAYS = 730
+
+CITIES = [
+    ('San Francisco', 'CA'), ('Oakland', 'CA'), ('Los Angeles', 'CA'), ('New York', 'NY'),
+    ('Brooklyn', 'NY'), ('Austin', 'TX'), ('Houston', 'TX'), ('Chicago', 'IL'),
+    ('Seattle', 'WA'), ('Portland', 'OR'), ('Nashville', 'TN'), ('New Orleans', 'LA'),
+]
+WORDS = [
+    'Blue', 'Red', 'Velvet', 'Electric', 'Silver', 'Midnight', 'Golden', 'Wild',
+    'Lonely', 'Neon', 'Stone', 'Echo', 'Crystal', 'Iron', 'Paper', 'Lucky',
+]
+KINDS = ['Hall', 'Lounge', 'Club', 'Room', 'Theatre', 'Garden', 'Bar', 'Arena']
+GENRES = [
+    'Alternative', 'Blues', 'Classical', 'Country', 'Electronic', 'Folk', 'Funk',
+    'Hip-Hop', 'Heavy Metal', 'Instrumental', 'Jazz', 'Musical Theatre', 'Pop',
+    'Punk', 'R&B', 'Reggae', 'Rock n Roll', 'Soul', 'Other',
+]
+
+
+def scale(shows):
+    # artists and venues grow with the number of shows
+    return {'shows': shows, 'artists': max(10, shows // 20), 'venues': max(10, shows // 50)}
+
+
+def insert(table, rows):
+    for start in range(0, len(rows), BATCH_SIZE):
+        db.session.execute(table.insert(), rows[start:start + BATCH_SIZE])
+
+
+def reset_schema():
+    # drop everything in the database, then run every migration
+    if db.engine.dialect.name == 'postgresql':
+        db.session.execute(text('DROP SCHEMA IF EXISTS %s CASCADE' % ARCHIVE_SCHEMA))
+        db.session.execute(text('DROP SCHEMA public CASCADE'))
+        db.session.execute(text('CREATE SCHEMA public'))
+        db.session.commit()
+    else:
+        metadata = MetaData()
+        metadata.reflect(bind=db.engine)
+        metadata.drop_all(bind=db.engine)
+    db.session.remove()
+    if 'migrate' not in current_app.extensions:
+        Migrate(current_app, db, directory=MIGRATIONS)
+    upgrade(directory=MIGRATIONS)
+
+
+def show_slots(rng, shows, artists, venues, first_day):
+    # (artist id, venue id, start, minutes) for each show, taking a slot no
+    # other show of the artist or the venue has
+    taken = set()
+    for _ in range(shows):
+        while True:
+            artist_id, venue_id = rng.randint(1, artists), rng.randint(1, venues)
+            slot = rng.randrange(2 * DAYS * len(SLOT_HOURS))
+            if ('artist', artist_id, slot) not in taken and ('venue', venue_id, slot) not in taken:
+                break
+        taken.add(('artist', artist_id, slot))
+        taken.add(('venue', venue_id, slot))
+        day, hour = divmod(slot, len(SLOT_HOURS))
+        start = first_day + timedelta(days=day, hours=SLOT_HOURS[hour], minutes=15 * rng.randrange(4))
+        yield artist_id, venue_id, start, rng.choice(SHOW_MINUTES)
+
+
+def seed(shows, seed=1):
+    # rebuild the schema, then fill it for the given scale
+    rng = random.Random(seed)
+    sizes = scale(shows)
+    reset_schema()
+
+    # the migrations add the form's genres; any missing here are created
+    genres = Genre.named(GENRES)
+    db.session.flush()
+    genre_ids = [genre.id for genre in genres]
+
+    for model, link, owner, count, kind in (
+        (Artist, artist_genre, 'artist_id', sizes['artists'], 'The'),
+        (Venue, venue_genre, 'venue_id', sizes['venues'], None),
+    ):
+        rows, links = [], []
+        for id in range(1, count + 1):
+            city, state = rng.choice(CITIES)
+            name = ' '.join(rng.sample(WORDS, 2))
+            name = '%s %s %d' % (kind, name, id) if kind else '%s %s %d' % (name, rng.choice(KINDS), id)
+            row = {
+                'id': id, 'name': name, 'city': city, 'state': state,
+                'phone': '555-%03d-%04d' % (rng.randrange(1000), rng.randrange(10000)),
+                'image_link': 'https://example.com/img/%s/%d.jpg' % (model.__tablename__, id),
+                'facebook_link': 'https://www.facebook.com/%s%d' % (model.__tablename__, id),
+                'website': 'https://example.com/%s/%d' % (model.__tablename__, id),
+                'seeking_description': None,
+            }
+            if model is Venue:
+                row.update(address='%d Main St' % rng.randrange(1, 2000), seeking_talent=rng.random() < 0.3)
+            else:
+                row.update(seeking_venue=rng.random() < 0.3)
+            rows.append(row)
+            for genre_id in rng.sample(genre_ids, rng.randint(1, 3)):
+                links.append({owner: id, 'genre_id': genre_id})
+        insert(model.__table__, rows)
+        insert(link, links)
+
+    # shows spread over two years either side of today; on Postgres every
+    # month gets its partition first, as `flask partition-shows` would have
+    # made it, rather than the rows landing in the default partition
+    first_day = datetime.combine(date.today() - timedelta(days=DAYS), datetime.min.time())
+    if is_partitioned():
+        existing = set(partitions())
+        month = month_start(first_day)
+        while month <= first_day.date() + timedelta(days=2 * DAYS):
+            if month not in existing:
+                create_partition(month)
+            month = add_months(month, 1)
+    rows = []
+    slots = show_slots(rng, shows, sizes['artists'], sizes['venues'], first_day)
+    for id, (artist_id, venue_id, start, minutes) in enumerate(slots, 1):
+        rows.append({
+            'id': id,
+            'artist_id': artist_id,
+            'venue_id': venue_id,
+            'start_time': start,
+            'duration_minutes': minutes,
+            'counted_as_past': False,
+        })
+        if len(rows) == BATCH_SIZE:
+            insert(Show.__table__, rows)
+            rows = []
+    insert(Show.__table__, rows)
+
+    # explicit ids leave Postgres sequences behind; move them past the rows
+    if db.engine.dialect.name == 'postgresql':
+        for table in ('artist', 'venue', 'show'):
+            db.session.execute(text(
+                "SELECT setval(pg_get_serial_sequence('{0}', 'id'), (SELECT max(id) FROM {0}))".format(table)
+            ))
+
+    rebuild_counters()
+    db.session.commit()
+    return sizes
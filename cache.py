@@ -0,0 +1,210 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+from werkzeug.local import LocalProxy
+
+from routing import use_primary
+
+
+class LRUCache(object):
+    # bounded, process-local store; the least recently used entry goes first
+    # once maxsize is reached and entries older than ttl seconds read as misses
+
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def size(self):
+        return len(self.entries)
+
+
+class ByteLRUCache(object):
+    # bounded by the total size of its values (bytes, or (bytes, ...) tuples
+    # sized by their first item) rather than their number; values larger
+    # than maxbytes are not kept at all
+
+    def __init__(self, maxbytes):
+        self.maxbytes = maxbytes
+        self.bytes = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.evictions = 0
+
+    @staticmethod
+    def sizeof(value):
+        return len(value[0] if isinstance(value, tuple) else value)
+
+    def get(self, key):
+        with self.lock:
+            value = self.entries.get(key)
+            if value is not None:
+                self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        size = self.sizeof(value)
+        if size > self.maxbytes:
+            return
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.bytes -= self.sizeof(old)
+            self.entries[key] = value
+            self.bytes += size
+            while self.bytes > self.maxbytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.bytes -= self.sizeof(evicted)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self.lock:
+            value = self.entries.pop(key, None)
+            if value is not None:
+                self.bytes -= self.sizeof(value)
+
+    def size(self):
+        return len(self.entries)
+
+
+class RedisCache(object):
+    # shared store for multi-worker deployments, so an edit handled by one
+    # worker invalidates the entry for all of them; needs the redis package
+
+    def __init__(self, url, ttl=300, prefix='fyyur:entity:'):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+        self.evictions = 0
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return None if raw is None else json.loads(raw)
+
+    def set(self, key, value):
+        # datetimes (updated_at) come back as strings
+        self.client.set(self.prefix + key, json.dumps(value, default=str), ex=self.ttl)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def size(self):
+        return None
+
+
+class Entity(dict):
+    # a cached row; read its columns as attributes like the model instance
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+
+def entity_dict(obj):
+    data = dict((column.key, getattr(obj, column.key)) for column in obj.__table__.columns)
+    data['genre_names'] = obj.genre_names
+    return data
+
+
+class EntityCache(object):
+    # Artist and Venue rows by id, read-through on get and dropped by
+    # invalidate() after every write that touches them. Misses read the
+    # primary: a row from a lagging replica would outlive the write by the TTL
+
+    def __init__(self, backend=None):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def backend_from_config(config):
+        ttl = config['ENTITY_CACHE_TTL']
+        if config.get('ENTITY_CACHE_URL'):
+            return RedisCache(config['ENTITY_CACHE_URL'], ttl=ttl)
+        return LRUCache(maxsize=config['ENTITY_CACHE_SIZE'], ttl=ttl)
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(cls.backend_from_config(config))
+
+    def init_app(self, app):
+        self.backend = self.backend_from_config(app.config)
+        app.extensions['entity_cache'] = self
+
+    def key(self, model, id):
+        return '%s:%s' % (model.__tablename__, id)
+
+    def get(self, model, id):
+        # the cached row, loading it on a miss; None if no such row exists
+        entity = self.lookup(model, id)
+        if entity is not None:
+            return entity
+        with use_primary():
+            obj = model.query.get(id)
+        if obj is None:
+            return None
+        return self.store(model, id, entity_dict(obj))
+
+    def lookup(self, model, id):
+        # the cached row or None, without loading it; for callers that read
+        # the row some other way on a miss and hand it to store()
+        data = self.backend.get(self.key(model, id))
+        if data is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return Entity(data)
+
+    def store(self, model, id, data):
+        self.backend.set(self.key(model, id), data)
+        return Entity(data)
+
+    def invalidate(self, model, *ids):
+        for id in ids:
+            self.backend.delete(self.key(model, id))
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': float(self.hits) / lookups if lookups else 0.0,
+            'evictions': self.backend.evictions,
+            'size': self.backend.size(),
+        }
+
+
+# the current app's cache (create_app() gives every app its own); every
+# handler that writes an Artist or Venue must invalidate it
+entity_cache = LocalProxy(lambda: current_app.extensions['entity_cache'])
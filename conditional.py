@@ -0,0 +1,118 @@
+import hashlib
+from datetime import datetime
+
+from flask import Response, g, request, session
+from sqlalchemy import func, select
+from werkzeug.http import is_resource_modified
+
+from models import db, Artist, Venue, Show, TableVersion
+
+# Conditional GET for the listing and profile pages. Before a page is read,
+# one small query gives its validator: the latest updated_at of the rows it
+# shows, and for listings also their tables' table_version (a deleted row
+# leaves no updated_at behind). A client whose If-None-Match (or, on the
+# listings, If-Modified-Since) still matches gets a 304 with no page query
+# and no template. ETags are weak: the same page may be sent gzipped or not.
+#
+# updated_at moves on every edit and on every counter change, so a venue's
+# ETag also changes when one of its shows is added, deleted or starts being
+# counted as past. A profile's validator only makes bounded reads, since it
+# runs before every profile page, cached or not: the venue's (artist's) row,
+# the start of its next show (one seek on ix_show_venue_id_start_time, as the
+# page splits its shows at now and that changes when the show starts) and the
+# artist (venue) table_version, for the names and images it lists. Pages are
+# sent with Cache-Control: no-cache, so browsers and the CDN revalidate on
+# every visit, and never tagged while flashed messages are waiting.
+
+LISTINGS = {
+    'venues.venues': (Venue,),
+    'artists.artists': (Artist,),
+    'shows.shows': (Show, Artist, Venue),
+}
+
+PROFILES = {
+    'venues.show_venue': (Venue, 'venue_id'),
+    'artists.show_artist': (Artist, 'artist_id'),
+}
+
+
+def listing_validator(models):
+    # (validator, last modified) for pages listing every row of the models
+    tables = [model.__tablename__ for model in models]
+    versions = TableVersion.query.filter(TableVersion.name.in_(tables))
+    columns = [db.session.query(func.max(model.updated_at)).scalar_subquery() for model in models] + [
+        versions.with_entities(func.sum(TableVersion.version)).scalar_subquery(),
+        versions.with_entities(func.max(TableVersion.changed_at)).scalar_subquery(),
+    ]
+    row = db.session.query(*columns).one()
+    return tuple(row), row[-1]
+
+
+def profile_validator(model, id, now=None):
+    # the validator for a venue's (artist's) page: its updated_at and show
+    # counters, when its next show starts and the artist (venue) table's
+    # version; None if there is no such entity
+    now = now or datetime.now()
+    other, owner_id = (Artist, Show.venue_id) if model is Venue else (Venue, Show.artist_id)
+    next_show = select(func.min(Show.start_time)).where(owner_id == id, Show.start_time >= now).scalar_subquery()
+    other_version = select(TableVersion.version).where(TableVersion.name == other.__tablename__).scalar_subquery()
+    return db.session.query(
+        model.updated_at, model.upcoming_shows_count, model.past_shows_count, next_show, other_version,
+    ).filter(model.id == id).first()
+
+
+def etag(validator):
+    return hashlib.md5(repr(validator).encode('utf-8')).hexdigest()
+
+
+class ConditionalPages(object):
+
+    def init_app(self, app):
+        app.config.setdefault('CONDITIONAL_PAGES', True)
+        if app.config['CONDITIONAL_PAGES']:
+            app.before_request(self.check)
+            app.after_request(self.tag)
+        app.extensions['conditional_pages'] = self
+
+    def validator(self):
+        # (validator, last modified) for this request's page, or None
+        if request.endpoint in LISTINGS:
+            return listing_validator(LISTINGS[request.endpoint])
+        if request.endpoint in PROFILES:
+            model, arg = PROFILES[request.endpoint]
+            row = profile_validator(model, request.view_args[arg])
+            # Last-Modified would miss shows starting, so profiles only get ETags
+            return (tuple(row), None) if row is not None else None
+        return None
+
+    def check(self):
+        g.page_etag = None
+        if request.method not in ('GET', 'HEAD') or '_flashes' in session:
+            return None
+        validator = self.validator()
+        if validator is None:
+            return None
+        g.page_etag, g.page_last_modified = etag(validator[0]), validator[1]
+        if not is_resource_modified(request.environ, etag=g.page_etag, last_modified=g.page_last_modified):
+            response = Response(status=304)
+            self.headers(response)
+            return response
+        return None
+
+    def headers(self, response):
+        response.set_etag(g.page_etag, weak=True)
+        if g.page_last_modified is not None:
+            response.last_modified = g.page_last_modified
+        response.cache_control.no_cache = True
+
+    def tag(self, response):
+        if g.get('page_etag') is None or response.status_code != 200:
+            return response
+        if session.modified or '_flashes' in session:
+            return response
+        self.headers(response)
+        return response
+
+
+# the app's conditional GET handling, configured by create_app()
+conditional_pages = ConditionalPages()
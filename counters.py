@@ -0,0 +1,114 @@
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy import bindparam, func
+
+from models import db, Artist, Venue, Show
+
+# Artist and Venue carry upcoming_shows_count / past_shows_count so listings
+# never have to count the show table. A show is counted as upcoming until
+# roll_forward() sees that it has started and moves it to the past counters.
+# None of these commit; the caller's transaction covers the counters too.
+
+
+def _bump(model, ids, upcoming=0, past=0):
+    # ids maps an entity id to how many shows to add (or remove if negative);
+    # one UPDATE statement sent with every id's parameters (executemany)
+    if not ids:
+        return
+    table = model.__table__
+    db.session.execute(table.update().where(table.c.id == bindparam('entity_id')).values(
+        upcoming_shows_count=table.c.upcoming_shows_count + bindparam('upcoming_change'),
+        past_shows_count=table.c.past_shows_count + bindparam('past_change'),
+    ), [
+        {'entity_id': id, 'upcoming_change': upcoming * n, 'past_change': past * n}
+        for id, n in ids.items()
+    ])
+
+
+def record_show(show, now=None):
+    # count a newly added show on both its artist and its venue
+    now = now or datetime.now()
+    show.counted_as_past = show.start_time <= now
+    change = {'past': 1} if show.counted_as_past else {'upcoming': 1}
+    _bump(Artist, {show.artist_id: 1}, **change)
+    _bump(Venue, {show.venue_id: 1}, **change)
+
+
+def record_show_rows(rows, now=None):
+    # count a batch of show rows (dicts about to be bulk inserted) with one
+    # update per artist and venue instead of one per show
+    now = now or datetime.now()
+    for past in (False, True):
+        artists, venues = Counter(), Counter()
+        for row in rows:
+            row['counted_as_past'] = row['start_time'] <= now
+            if row['counted_as_past'] == past:
+                artists[row['artist_id']] += 1
+                venues[row['venue_id']] += 1
+        change = {'past': 1} if past else {'upcoming': 1}
+        _bump(Artist, artists, **change)
+        _bump(Venue, venues, **change)
+
+
+def remove_shows(*criteria):
+    # delete the shows matching criteria and take them off both sides'
+    # counters; returns {Artist: ids, Venue: ids} whose counters changed, for
+    # the caller to invalidate once it has committed
+    rows = db.session.query(
+        Show.artist_id, Show.venue_id, Show.counted_as_past, func.count(Show.id)
+    ).filter(*criteria).group_by(Show.artist_id, Show.venue_id, Show.counted_as_past).all()
+    uncount(rows)
+    db.session.query(Show).filter(*criteria).delete(synchronize_session=False)
+    return {Artist: set(row[0] for row in rows), Venue: set(row[1] for row in rows)}
+
+
+def uncount(rows):
+    # take shows off their artists' and venues' counters; rows are
+    # (artist_id, venue_id, counted_as_past, number of shows)
+    for past in (False, True):
+        artists, venues = Counter(), Counter()
+        for artist_id, venue_id, counted_as_past, n in rows:
+            if counted_as_past == past:
+                artists[artist_id] += n
+                venues[venue_id] += n
+        change = {'past': -1} if past else {'upcoming': -1}
+        _bump(Artist, artists, **change)
+        _bump(Venue, venues, **change)
+
+
+def roll_forward(now=None):
+    # move every show that has started since the last run from upcoming to past.
+    # the due rows are locked so two overlapping runs cannot count them twice
+    now = now or datetime.now()
+    due = db.session.query(Show.id, Show.artist_id, Show.venue_id).filter(
+        Show.counted_as_past == False, Show.start_time <= now
+    ).with_for_update().all()
+    if not due:
+        return 0
+    _bump(Artist, Counter(artist_id for _, artist_id, _ in due), upcoming=-1, past=1)
+    _bump(Venue, Counter(venue_id for _, _, venue_id in due), upcoming=-1, past=1)
+    ids = [id for id, _, _ in due]
+    for start in range(0, len(ids), 1000):
+        # the start_time bound keeps the update to partitions that have started
+        db.session.query(Show).filter(Show.id.in_(ids[start:start + 1000]), Show.start_time <= now).update(
+            {Show.counted_as_past: True}, synchronize_session=False
+        )
+    return len(due)
+
+
+def rebuild_counters(now=None):
+    # recount everything from the show table, e.g. after a bulk load or to repair drift
+    now = now or datetime.now()
+    db.session.query(Show).update(
+        {Show.counted_as_past: Show.start_time <= now}, synchronize_session=False
+    )
+    for model, fk in ((Artist, Show.artist_id), (Venue, Show.venue_id)):
+        def count(past):
+            return db.session.query(func.count(Show.id)).filter(
+                fk == model.id, Show.counted_as_past == past
+            ).scalar_subquery()
+        db.session.query(model).update({
+            model.upcoming_shows_count: count(False),
+            model.past_shows_count: count(True),
+        }, synchronize_session=False)
@@ -0,0 +1,137 @@
+import os
+import threading
+import time
+import weakref
+
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import orm
+from sqlalchemy.exc import TimeoutError
+from sqlalchemy.pool import QueuePool
+
+from routing import RoutingSession
+
+# Engine setup for the app's `db`: connection pool limits and the Postgres
+# statement timeout come from config (see config.py, all overridable through
+# the environment), every pool records how long checkouts wait, and engines
+# are disposed in forked children so pre-forking servers never share a
+# parent's sockets. Sessions route reads to replicas (see routing.py).
+
+
+class PoolMetrics(object):
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record(self, waited, timed_out=False):
+        with self.lock:
+            self.checkouts += 1
+            self.timeouts += timed_out
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'wait_ms_total': round(self.wait_total * 1000, 3),
+                'wait_ms_avg': round(self.wait_total * 1000 / self.checkouts, 3) if self.checkouts else 0.0,
+                'wait_ms_max': round(self.wait_max * 1000, 3),
+            }
+
+
+class MeteredQueuePool(QueuePool):
+    # QueuePool that times every checkout, including the wait for a free
+    # connection when pool_size + max_overflow are all in use
+
+    def __init__(self, *args, **kwargs):
+        QueuePool.__init__(self, *args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = QueuePool._do_get(self)
+        except TimeoutError:
+            self.metrics.record(time.perf_counter() - started, timed_out=True)
+            raise
+        self.metrics.record(time.perf_counter() - started)
+        return connection
+
+    def recreate(self):
+        # dispose() swaps in a fresh pool; keep counting into the same metrics
+        pool = QueuePool.recreate(self)
+        pool.metrics = self.metrics
+        return pool
+
+
+def pool_stats(engine):
+    pool = engine.pool
+    if not isinstance(pool, QueuePool):
+        # SQLite runs without a queue (NullPool/StaticPool)
+        return {'pool': type(pool).__name__}
+    stats = {
+        'pool': type(pool).__name__,
+        'size': pool.size(),
+        'checked_out': pool.checkedout(),
+        'checked_in': pool.checkedin(),
+        'overflow': max(0, pool.overflow()),
+        'max_overflow': pool._max_overflow,
+    }
+    if isinstance(pool, MeteredQueuePool):
+        stats.update(pool.metrics.stats())
+    return stats
+
+
+_engines = weakref.WeakSet()
+
+
+def _dispose_after_fork():
+    # the child must not reuse the parent's connections; close=False leaves
+    # them open for the parent and just forgets them here
+    for engine in list(_engines):
+        engine.dispose(close=False)
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_dispose_after_fork)
+
+
+class Database(SQLAlchemy):
+
+    def apply_driver_hacks(self, app, sa_url, options):
+        sa_url, options = SQLAlchemy.apply_driver_hacks(self, app, sa_url, options)
+        if sa_url.drivername.startswith('sqlite'):
+            return sa_url, options
+        config = app.config
+        options.setdefault('poolclass', MeteredQueuePool)
+        options.setdefault('pool_size', config['DB_POOL_SIZE'])
+        options.setdefault('max_overflow', config['DB_MAX_OVERFLOW'])
+        options.setdefault('pool_timeout', config['DB_POOL_TIMEOUT'])
+        options.setdefault('pool_recycle', config['DB_POOL_RECYCLE'])
+        options.setdefault('pool_pre_ping', config['DB_POOL_PRE_PING'])
+        if sa_url.drivername.startswith('postgresql') and config['DB_STATEMENT_TIMEOUT']:
+            connect_args = options.setdefault('connect_args', {})
+            connect_args.setdefault('options', '-c statement_timeout=%d' % config['DB_STATEMENT_TIMEOUT'])
+        return sa_url, options
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def create_engine(self, sa_url, engine_opts):
+        engine = SQLAlchemy.create_engine(self, sa_url, engine_opts)
+        _engines.add(engine)
+        return engine
+
+    def init_app(self, app):
+        app.config.setdefault('DB_POOL_SIZE', 5)
+        app.config.setdefault('DB_MAX_OVERFLOW', 10)
+        app.config.setdefault('DB_POOL_TIMEOUT', 30)
+        app.config.setdefault('DB_POOL_RECYCLE', 1800)
+        app.config.setdefault('DB_POOL_PRE_PING', True)
+        app.config.setdefault('DB_STATEMENT_TIMEOUT', 0)
+        SQLAlchemy.init_app(self, app)
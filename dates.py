@@ -0,0 +1,48 @@
+from datetime import date, datetime
+from functools import lru_cache
+
+# named formats accepted by the `datetime` template filter
+FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+}
+
+
+@lru_cache(maxsize=64)
+def compiled(format, locale):
+    # babel's parsed pattern and locale, built once per (format, locale);
+    # babel itself is only imported the first time a date is formatted
+    from babel import Locale
+    from babel.dates import parse_pattern
+    return parse_pattern(FORMATS.get(format, format)), Locale.parse(locale)
+
+
+def to_datetime(value):
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    value = str(value)
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        # anything else goes through the slower but forgiving dateutil parser
+        import dateutil.parser
+        return dateutil.parser.parse(value)
+
+
+def format_datetime(value, format='medium', locale='en'):
+    pattern, locale = compiled(format, locale)
+    return pattern.apply(to_datetime(value), locale)
+
+
+def format_datetimes(values, format='medium', locale='en'):
+    # format a whole list at once, formatting each distinct value only once
+    pattern, locale = compiled(format, locale)
+    done = {}
+    formatted = []
+    for value in values:
+        if value not in done:
+            done[value] = pattern.apply(to_datetime(value), locale)
+        formatted.append(done[value])
+    return formatted
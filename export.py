@@ -0,0 +1,97 @@
+import csv
+import io
+import json
+from itertools import islice
+
+from models import db, Artist, Venue, Genre, artist_genre, venue_genre
+from queries import iter_shows
+
+# Full-table dumps for /export/<table>.<format>. Rows come off a server-side
+# cursor (yield_per) as plain column tuples and are written out in ~64KB
+# pieces, so memory stays flat however large the table is. The columns
+# match what `flask fyyur import` reads, so an export can be loaded back.
+
+CHUNK_BYTES = 64 * 1024
+
+SHOW_COLUMNS = ('id', 'start_time', 'duration_minutes', 'venue_id', 'venue_name', 'artist_id', 'artist_name', 'artist_image_link')
+ARTIST_COLUMNS = ('id', 'name', 'city', 'state', 'phone', 'genres', 'image_link', 'facebook_link', 'website',
+                  'seeking_venue', 'seeking_description', 'upcoming_shows_count', 'past_shows_count')
+VENUE_COLUMNS = ('id', 'name', 'city', 'state', 'address', 'phone', 'genres', 'image_link', 'facebook_link',
+                 'website', 'seeking_talent', 'seeking_description', 'upcoming_shows_count', 'past_shows_count')
+
+
+def show_records(batch_size):
+    for row in iter_shows(batch_size):
+        yield row._asdict()
+
+
+def entity_records(model, columns, batch_size):
+    # artists or venues by id; the genres of each cursor batch come from one
+    # IN query on the association table instead of one lazy load per row
+    link = artist_genre if model is Artist else venue_genre
+    owner = link.c.artist_id if model is Artist else link.c.venue_id
+    rows = iter(db.session.query(
+        *[getattr(model, column) for column in columns if column != 'genres']
+    ).order_by(model.id).yield_per(batch_size))
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+        genres = {}
+        for id, name in db.session.query(owner, Genre.name).join(
+            Genre, Genre.id == link.c.genre_id
+        ).filter(owner.in_([row.id for row in batch])).order_by(owner, Genre.name):
+            genres.setdefault(id, []).append(name)
+        for row in batch:
+            record = row._asdict()
+            record['genres'] = genres.get(row.id, [])
+            yield dict((column, record[column]) for column in columns)
+
+
+# table -> (columns, tables the rows are read from, record generator)
+EXPORTS = {
+    'shows': (SHOW_COLUMNS, ('show', 'artist', 'venue'), show_records),
+    'artists': (ARTIST_COLUMNS, ('artist',), lambda batch_size: entity_records(Artist, ARTIST_COLUMNS, batch_size)),
+    'venues': (VENUE_COLUMNS, ('venue',), lambda batch_size: entity_records(Venue, VENUE_COLUMNS, batch_size)),
+}
+
+
+def csv_chunks(records, columns):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, columns)
+    writer.writeheader()
+    for record in records:
+        if 'genres' in record:
+            record['genres'] = ','.join(record['genres'])
+        writer.writerow(record)
+        if buffer.tell() >= CHUNK_BYTES:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def jsonl_chunks(records, columns):
+    lines, size = [], 0
+    for record in records:
+        line = json.dumps(record, default=str)
+        lines.append(line)
+        size += len(line) + 1
+        if size >= CHUNK_BYTES:
+            yield '\n'.join(lines) + '\n'
+            lines, size = [], 0
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+FORMATS = {
+    'csv': ('text/csv', csv_chunks),
+    'jsonl': ('application/x-ndjson', jsonl_chunks),
+}
+
+
+def export(table, format, batch_size=1000):
+    # (mimetype, generator of text chunks) for one table in one format
+    columns, _, records = EXPORTS[table]
+    mimetype, chunks = FORMATS[format]
+    return mimetype, chunks(records(batch_size), columns)
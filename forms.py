@@ -1,7 +1,9 @@
 from datetime import datetime
 from flask_wtf import Form
-from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField
-from wtforms.validators import DataRequired, AnyOf, URL, Length, Regexp
+from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField, IntegerField, TextAreaField
+from wtforms.validators import DataRequired, AnyOf, URL, Length, Regexp, Optional, NumberRange
+
+from models import DEFAULT_SHOW_MINUTES, MAX_SHOW_MINUTES
 
 class ShowForm(Form):
     artist_id = StringField(
@@ -15,6 +17,17 @@ class ShowForm(Form):
         validators=[DataRequired()],
         default= datetime.today()
     )
+    duration_minutes = IntegerField(
+        'duration_minutes',
+        validators=[Optional(), NumberRange(min=1, max=MAX_SHOW_MINUTES)],
+        default=DEFAULT_SHOW_MINUTES
+    )
+
+class TourForm(Form):
+    # one show per line: artist_id, venue_id, start_time[, duration_minutes]
+    shows = TextAreaField(
+        'shows', validators=[DataRequired()]
+    )
 
 class VenueForm(Form):
     name = StringField(
@@ -194,7 +207,7 @@ class ArtistForm(Form):
     phone = StringField(
         # TODO implement validation logic for state
         'phone',
-        validators=[DataRequired(), Length(min=10, max=10), Regexp(regex='^[+-]?[0-9]$')]
+        validators=[DataRequired(), Length(min=10, max=10), Regexp(regex='^[+-]?[0-9]+$')]
     )
     image_link = StringField(
         'image_link'
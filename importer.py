@@ -0,0 +1,336 @@
+import csv
+import io
+import json
+import os
+from datetime import timedelta
+
+from werkzeug.datastructures import MultiDict
+
+from availability import Bookings, describe
+from counters import record_show_rows
+from forms import ArtistForm, VenueForm, ShowForm
+from models import db, Artist, Venue, Show, Genre, artist_genre, venue_genre, DEFAULT_SHOW_MINUTES
+from versions import touch
+
+# Bulk loading for `flask fyyur import`. Rows stream from a CSV or JSONL file,
+# are checked with the same form rules as the create pages and are written a
+# chunk at a time, one transaction per chunk. Memory grows with the chunk
+# size, not the file: shows also hold the booked shows of the artists and
+# venues in the current chunk (see ShowImporter). Rejected rows go to a JSONL
+# error report together with a checkpoint after every committed chunk;
+# --resume continues after the last checkpoint.
+
+# input column -> form field, for files exported straight from the models
+ALIASES = {'website': 'website_link'}
+FALSE_VALUES = ('', '0', 'f', 'false', 'n', 'no', 'off')
+
+
+def read_rows(path, format=None):
+    # (line number, row) pairs; a row that cannot be parsed is an exception
+    format = format or os.path.splitext(path)[1].lstrip('.').lower()
+    with open(path, newline='', encoding='utf-8') as f:
+        if format == 'csv':
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+        elif format in ('jsonl', 'ndjson', 'json'):
+            for line, text in enumerate(f, 1):
+                if not text.strip():
+                    continue
+                try:
+                    row = json.loads(text)
+                except ValueError as err:
+                    yield line, err
+                    continue
+                yield line, row if isinstance(row, dict) else ValueError('expected a JSON object')
+        else:
+            raise ValueError('unknown import format %r; use csv or jsonl' % format)
+
+
+def form_data(form, row):
+    # the row as the MultiDict a browser would have posted for the form
+    data = MultiDict()
+    for key, value in row.items():
+        key = ALIASES.get(key, key)
+        if key not in form or value is None:
+            continue
+        if form[key].type == 'BooleanField':
+            if isinstance(value, str) and value.strip().lower() in FALSE_VALUES or value is False:
+                continue
+            data.add(key, 'y')
+        elif form[key].type == 'SelectMultipleField':
+            values = value.split(',') if isinstance(value, str) else value
+            for item in values:
+                if str(item).strip():
+                    data.add(key, str(item).strip())
+        else:
+            data.add(key, str(value).strip())
+    return data
+
+
+class ErrorReport(object):
+    # JSONL of rejected rows, with {"checkpoint": line} after each committed chunk
+
+    def __init__(self, path, resume=False):
+        self.path = path
+        self.checkpoint = self.last_checkpoint(path) if resume else 0
+        self.rejected = 0
+        self.file = open(path, 'a' if resume else 'w', encoding='utf-8')
+
+    @staticmethod
+    def last_checkpoint(path):
+        checkpoint = 0
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                for text in f:
+                    try:
+                        checkpoint = json.loads(text).get('checkpoint', checkpoint)
+                    except ValueError:
+                        break  # a line cut short by a crash; nothing after it counts
+        return checkpoint
+
+    def reject(self, line, row, errors):
+        self.rejected += 1
+        self.file.write(json.dumps({'line': line, 'row': row, 'errors': errors}, default=str) + '\n')
+
+    def commit(self, line):
+        self.checkpoint = line
+        self.file.write(json.dumps({'checkpoint': line}) + '\n')
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class Importer(object):
+    form_class = None
+
+    def __init__(self, report, chunk_size=5000):
+        self.report = report
+        self.chunk_size = chunk_size
+        self.imported = 0
+        # one form reused for every row; csrf only makes sense for browser posts
+        self.form = self.form_class(meta={'csrf': False})
+
+    def validate(self, row):
+        # the values to insert, or a dict of field errors
+        self.form.process(form_data(self.form, row))
+        if not self.form.validate():
+            return None, self.form.errors
+        return self.values(self.form), None
+
+    def run(self, rows):
+        chunk, line, seen = [], self.report.checkpoint, 0
+        for line, row in rows:
+            if line <= self.report.checkpoint:
+                continue
+            seen += 1
+            if isinstance(row, Exception):
+                self.report.reject(line, None, {'row': [str(row)]})
+            else:
+                values, errors = self.validate(row)
+                if errors:
+                    self.report.reject(line, row, errors)
+                else:
+                    chunk.append((line, row, values))
+            if seen == self.chunk_size:
+                self.flush(chunk, line)
+                chunk, seen = [], 0
+        self.flush(chunk, line)
+        return self.imported
+
+    def flush(self, chunk, line):
+        if line <= self.report.checkpoint:
+            return
+        rows = [values for _, _, values in chunk]
+        try:
+            if rows:
+                self.write(rows)
+            db.session.commit()
+            self.imported += len(chunk)
+        except Exception as err:
+            db.session.rollback()
+            for row_line, row, _ in chunk:
+                self.report.reject(row_line, row, {'database': [str(err)]})
+            self.rolled_back(rows)
+        else:
+            self.committed(rows)
+        finally:
+            db.session.expunge_all()
+        self.report.commit(line)
+
+    def values(self, form):
+        raise NotImplementedError
+
+    def write(self, rows):
+        raise NotImplementedError
+
+    def committed(self, rows):
+        # the chunk's rows are in the database
+        pass
+
+    def rolled_back(self, rows):
+        # the chunk was rejected; forget anything validate() or write() kept
+        pass
+
+
+class EntityImporter(Importer):
+    # artists and venues go through the ORM so their ids come back for the
+    # genre links, which are then added with one executemany per chunk
+    model = None
+    link = None
+    owner = None
+
+    def __init__(self, *args, **kwargs):
+        Importer.__init__(self, *args, **kwargs)
+        choices = [value for value, _ in self.form.genres.choices]
+        genres = Genre.named(choices)
+        db.session.flush()
+        self.genre_ids = dict((genre.name, genre.id) for genre in genres)
+        db.session.commit()
+
+    def values(self, form):
+        values = dict((column, form[column].data) for column in self.columns)
+        values['website'] = form.website_link.data
+        values['genres'] = form.genres.data
+        return values
+
+    def write(self, rows):
+        entities = []
+        for values in rows:
+            values = dict(values)
+            genres = values.pop('genres')
+            entities.append((self.model(**values), genres))
+        db.session.add_all([entity for entity, _ in entities])
+        db.session.flush()
+        links = [{self.owner: entity.id, 'genre_id': self.genre_ids[name]}
+                 for entity, genres in entities for name in dict.fromkeys(genres)]
+        if links:
+            db.session.execute(self.link.insert(), links)
+
+
+class ArtistImporter(EntityImporter):
+    form_class = ArtistForm
+    model = Artist
+    link = artist_genre
+    owner = 'artist_id'
+    columns = ('name', 'city', 'state', 'phone', 'image_link', 'facebook_link',
+               'seeking_venue', 'seeking_description')
+
+
+class VenueImporter(EntityImporter):
+    form_class = VenueForm
+    model = Venue
+    link = venue_genre
+    owner = 'venue_id'
+    columns = ('name', 'city', 'state', 'address', 'phone', 'image_link', 'facebook_link',
+               'seeking_talent', 'seeking_description')
+
+
+class ShowImporter(Importer):
+    # shows reference their artist and venue by id (artist_id/venue_id) or by
+    # exact name (artist/venue). Both are resolved against maps loaded once,
+    # then each chunk is written with COPY on Postgres or a single executemany
+    # elsewhere, and counted with one counter update per artist and venue.
+    # Rows that overlap a show of the same artist or venue, already booked or
+    # earlier in the file, are rejected using in-memory interval trees. The
+    # trees are dropped after every chunk, committed or not, and reloaded
+    # from the database, so earlier chunks are checked against what they
+    # actually committed.
+    form_class = ShowForm
+    copy_columns = ('artist_id', 'venue_id', 'start_time', 'duration_minutes', 'counted_as_past')
+
+    def __init__(self, *args, **kwargs):
+        Importer.__init__(self, *args, **kwargs)
+        self.refs = dict((model, self.load_refs(model)) for model in (Artist, Venue))
+        self.bookings = Bookings()
+        self.touched = {Artist: set(), Venue: set()}
+
+    @staticmethod
+    def load_refs(model):
+        ids, names = set(), {}
+        for id, name in db.session.query(model.id, model.name).yield_per(10000):
+            ids.add(id)
+            names.setdefault(name, []).append(id)
+        return ids, names
+
+    def resolve(self, model, row, key):
+        ids, names = self.refs[model]
+        id, name = row.get(key + '_id'), row.get(key)
+        if id not in (None, ''):
+            try:
+                id = int(id)
+            except (TypeError, ValueError):
+                return None, 'not an id: %r' % (id,)
+            return (id, None) if id in ids else (None, 'no %s with id %d' % (key, id))
+        if name:
+            matches = names.get(name, [])
+            if len(matches) == 1:
+                return matches[0], None
+            if matches:
+                return None, '%d %ss are named %r; give %s_id' % (len(matches), key, name, key)
+            return None, 'no %s named %r' % (key, name)
+        return None, 'give %s_id or %s' % (key, key)
+
+    def validate(self, row):
+        values, errors = Importer.validate(self, row)
+        errors = dict(errors or {})
+        if not row.get('start_time'):
+            # the form would fall back to its default of today
+            errors['start_time'] = ['This field is required.']
+        refs = {}
+        for model, key in ((Artist, 'artist'), (Venue, 'venue')):
+            refs[key + '_id'], error = self.resolve(model, row, key)
+            if error:
+                errors[key + '_id'] = [error]
+        if errors:
+            return None, errors
+        values.update(refs)
+        start = values['start_time']
+        end = start + timedelta(minutes=values['duration_minutes'])
+        conflicts = self.bookings.conflicts(values['artist_id'], values['venue_id'], start, end)
+        if conflicts:
+            return None, {'start_time': [describe(conflict) for conflict in conflicts]}
+        self.bookings.add(values['artist_id'], values['venue_id'], start, end)
+        return values, None
+
+    def values(self, form):
+        return {
+            'start_time': form.start_time.data,
+            'duration_minutes': form.duration_minutes.data or DEFAULT_SHOW_MINUTES,
+        }
+
+    def write(self, rows):
+        record_show_rows(rows)
+        if db.engine.dialect.name == 'postgresql':
+            self.copy(rows)
+        else:
+            db.session.execute(Show.__table__.insert(), rows)
+
+    def committed(self, rows):
+        self.touched[Artist].update(row['artist_id'] for row in rows)
+        self.touched[Venue].update(row['venue_id'] for row in rows)
+        self.bookings.clear()
+
+    def rolled_back(self, rows):
+        self.bookings.clear()
+
+    def copy(self, rows):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([row[column] for column in self.copy_columns])
+        buffer.seek(0)
+        cursor = db.session.connection().connection.cursor()
+        try:
+            cursor.copy_expert('COPY "show" (%s) FROM STDIN WITH (FORMAT csv)' % ', '.join(self.copy_columns), buffer)
+        finally:
+            cursor.close()
+        touch(db.session, 'show')  # COPY goes around the session's statement events
+
+
+IMPORTERS = {
+    'artists': ArtistImporter,
+    'venues': VenueImporter,
+    'shows': ShowImporter,
+}
@@ -0,0 +1,122 @@
+import json
+import re
+import time
+from collections import Counter
+
+from flask import g, has_request_context, request
+from flask import request_started, request_finished, before_render_template, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# collapse literals and expanded IN lists so statements that differ only in
+# their parameters share one shape
+PARAMS = re.compile(r"(\?|%\(\w+\)s|%s|:\w+|'[^']*'|\b\d+\b)")
+PARAM_LISTS = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+SPACE = re.compile(r'\s+')
+
+
+def statement_shape(statement):
+    shape = PARAMS.sub('?', statement)
+    shape = PARAM_LISTS.sub('(?)', shape)
+    return SPACE.sub(' ', shape).strip()
+
+
+class RequestMetrics(object):
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.statements = 0
+        self.db_time = 0.0
+        self.render_time = 0.0
+        self.shapes = Counter()
+
+    def repeated(self, threshold):
+        return [(shape, n) for shape, n in self.shapes.most_common() if n >= threshold]
+
+
+def current_metrics():
+    if has_request_context():
+        return getattr(g, '_request_metrics', None)
+    return None
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['query_started'].pop()
+    metrics = current_metrics()
+    if metrics is not None:
+        metrics.statements += 1
+        metrics.db_time += time.perf_counter() - started
+        metrics.shapes[statement_shape(statement)] += 1
+
+
+@event.listens_for(Engine, 'handle_error')
+def _handle_error(context):
+    started = context.connection.info.get('query_started') if context.connection else None
+    if started:
+        started.pop()
+
+
+class Instrumentation(object):
+    # per-request statement count, DB time, template render time and total
+    # time, sent back as a Server-Timing header and logged on the app logger
+    # as one JSON line. A statement shape repeated N_PLUS_ONE_THRESHOLD times
+    # in one request is logged as a likely N+1 query.
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('INSTRUMENTATION', True)
+        app.config.setdefault('N_PLUS_ONE_THRESHOLD', 5)
+        if not app.config['INSTRUMENTATION']:
+            return
+        request_started.connect(self.request_started, app)
+        request_finished.connect(self.request_finished, app)
+        before_render_template.connect(self.before_render, app)
+        template_rendered.connect(self.after_render, app)
+
+    def request_started(self, sender, **extra):
+        g._request_metrics = RequestMetrics()
+
+    def before_render(self, sender, template, context, **extra):
+        metrics = current_metrics()
+        if metrics is not None:
+            metrics.render_started = time.perf_counter()
+
+    def after_render(self, sender, template, context, **extra):
+        metrics = current_metrics()
+        if metrics is not None and hasattr(metrics, 'render_started'):
+            metrics.render_time += time.perf_counter() - metrics.render_started
+
+    def request_finished(self, sender, response, **extra):
+        metrics = current_metrics()
+        if metrics is None:
+            return
+        total = time.perf_counter() - metrics.started
+        response.headers.add('Server-Timing', ', '.join([
+            'db;dur=%.2f;desc="%d queries"' % (metrics.db_time * 1000, metrics.statements),
+            'render;dur=%.2f' % (metrics.render_time * 1000),
+            'total;dur=%.2f' % (total * 1000),
+        ]))
+
+        repeated = metrics.repeated(sender.config['N_PLUS_ONE_THRESHOLD'])
+        sender.logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'endpoint': request.endpoint,
+            'status': response.status_code,
+            'statements': metrics.statements,
+            'db_ms': round(metrics.db_time * 1000, 2),
+            'render_ms': round(metrics.render_time * 1000, 2),
+            'total_ms': round(total * 1000, 2),
+            'repeated_statements': len(repeated),
+        }, sort_keys=True))
+        for shape, n in repeated:
+            sender.logger.warning('possible N+1 in %s: %d x %s', request.endpoint, n, shape)
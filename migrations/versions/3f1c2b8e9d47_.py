@@ -0,0 +1,40 @@
+"""add search indexes
+
+Revision ID: 3f1c2b8e9d47
+Revises: 71990f529483
+Create Date: 2026-10-18 10:12:31.402118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c2b8e9d47'
+down_revision = '71990f529483'
+branch_labels = None
+depends_on = None
+
+# keep in step with search.search_document()
+DOCUMENT = ("to_tsvector('simple', coalesce(name, '') || ' ' || "
+            "coalesce(city, '') || ' ' || coalesce(genres, ''))")
+
+
+def upgrade():
+    # the indexes are Postgres-only; other databases use search.InvertedIndex
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table in ('artist', 'venue'):
+        op.execute('CREATE INDEX ix_{0}_search_document ON {0} USING gin ({1})'.format(table, DOCUMENT))
+        op.execute('CREATE INDEX ix_{0}_name_trgm ON {0} USING gin (name gin_trgm_ops)'.format(table))
+        op.execute('CREATE INDEX ix_{0}_city_trgm ON {0} USING gin (city gin_trgm_ops)'.format(table))
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for table in ('artist', 'venue'):
+        op.drop_index('ix_{0}_city_trgm'.format(table), table_name=table)
+        op.drop_index('ix_{0}_name_trgm'.format(table), table_name=table)
+        op.drop_index('ix_{0}_search_document'.format(table), table_name=table)
@@ -0,0 +1,45 @@
+"""add denormalized show counters
+
+Revision ID: a54d07c3e1b2
+Revises: 3f1c2b8e9d47
+Create Date: 2026-10-18 11:02:47.913560
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a54d07c3e1b2'
+down_revision = '3f1c2b8e9d47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('artist', 'venue'):
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('past_shows_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('show', sa.Column('counted_as_past', sa.Boolean(), server_default=sa.false(), nullable=False))
+    op.create_index('ix_show_upcoming_start_time', 'show', ['start_time'],
+                    postgresql_where=sa.text('NOT counted_as_past'),
+                    sqlite_where=sa.text('NOT counted_as_past'))
+
+    # backfill: split existing shows at the current time and count them
+    op.execute(sa.text('UPDATE show SET counted_as_past = (start_time <= :now)').bindparams(now=datetime.now()))
+    for table in ('artist', 'venue'):
+        op.execute(
+            'UPDATE {0} SET '
+            'upcoming_shows_count = (SELECT count(*) FROM show WHERE show.{0}_id = {0}.id AND NOT show.counted_as_past), '
+            'past_shows_count = (SELECT count(*) FROM show WHERE show.{0}_id = {0}.id AND show.counted_as_past)'.format(table)
+        )
+
+
+def downgrade():
+    op.drop_index('ix_show_upcoming_start_time', table_name='show')
+    op.drop_column('show', 'counted_as_past')
+    for table in ('venue', 'artist'):
+        op.drop_column(table, 'past_shows_count')
+        op.drop_column(table, 'upcoming_shows_count')
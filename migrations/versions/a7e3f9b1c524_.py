@@ -0,0 +1,44 @@
+"""add updated_at to artist, venue and show
+
+Revision ID: a7e3f9b1c524
+Revises: d4a9c1e7f203
+Create Date: 2026-10-18 23:12:08.614392
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7e3f9b1c524'
+down_revision = 'd4a9c1e7f203'
+branch_labels = None
+depends_on = None
+
+TABLES = ['artist', 'venue', 'show']
+
+
+def restore_partial_index():
+    # SQLite's batch mode copies the table and loses the index's WHERE clause
+    if op.get_bind().dialect.name == 'sqlite':
+        op.drop_index('ix_show_upcoming_start_time', table_name='show')
+        op.create_index('ix_show_upcoming_start_time', 'show', ['start_time'],
+                        sqlite_where=sa.text('NOT counted_as_past'))
+
+
+def upgrade():
+    # existing rows start at upgrade time
+    for table in TABLES:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=False,
+                                          server_default=sa.func.current_timestamp()))
+            batch_op.create_index('ix_%s_updated_at' % table, ['updated_at'])
+    restore_partial_index()
+
+
+def downgrade():
+    for table in TABLES:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_index('ix_%s_updated_at' % table)
+            batch_op.drop_column('updated_at')
+    restore_partial_index()
@@ -0,0 +1,75 @@
+"""add show duration and booking exclusion constraints
+
+Revision ID: b3d8e2f5a716
+Revises: f1a7c4d2b9e0
+Create Date: 2026-10-18 21:14:37.509162
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3d8e2f5a716'
+down_revision = 'f1a7c4d2b9e0'
+branch_labels = None
+depends_on = None
+
+# keep in step with models.DEFAULT_SHOW_MINUTES / MAX_SHOW_MINUTES
+DEFAULT_SHOW_MINUTES = 120
+MAX_SHOW_MINUTES = 24 * 60
+
+# shows that already overlap one of the same artist or venue; the exclusion
+# constraints cannot be added while any are left
+OVERLAPS = """
+SELECT a.id, b.id FROM "show" a JOIN "show" b
+  ON a.id < b.id AND (a.venue_id = b.venue_id OR a.artist_id = b.artist_id)
+ AND b.start_time < a.start_time + make_interval(mins => a.duration_minutes)
+ AND a.start_time < b.start_time + make_interval(mins => b.duration_minutes)
+LIMIT 20
+"""
+
+
+def restore_partial_index():
+    # SQLite's batch mode copies the table and loses the index's WHERE clause
+    if op.get_bind().dialect.name == 'sqlite':
+        op.drop_index('ix_show_upcoming_start_time', table_name='show')
+        op.create_index('ix_show_upcoming_start_time', 'show', ['start_time'],
+                        sqlite_where=sa.text('NOT counted_as_past'))
+
+
+def upgrade():
+    with op.batch_alter_table('show') as batch_op:
+        batch_op.add_column(sa.Column('duration_minutes', sa.Integer(), nullable=False,
+                                      server_default=str(DEFAULT_SHOW_MINUTES)))
+        batch_op.create_check_constraint('ck_show_duration_minutes',
+                                         'duration_minutes BETWEEN 1 AND %d' % MAX_SHOW_MINUTES)
+    restore_partial_index()
+
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    overlaps = op.get_bind().execute(sa.text(OVERLAPS)).fetchall()
+    if overlaps:
+        raise RuntimeError(
+            'shows overlap another show of the same artist or venue; move or shorten them '
+            'and run the upgrade again (show id pairs: %s)' % ', '.join('%d/%d' % pair for pair in overlaps)
+        )
+    # btree_gist lets the GiST constraints compare the integer ids with =
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    op.execute(
+        'ALTER TABLE "show" ADD COLUMN during tsrange GENERATED ALWAYS AS '
+        "(tsrange(start_time, start_time + make_interval(mins => duration_minutes), '[)')) STORED"
+    )
+    op.execute('ALTER TABLE "show" ADD CONSTRAINT ex_show_venue_during EXCLUDE USING gist (venue_id WITH =, during WITH &&)')
+    op.execute('ALTER TABLE "show" ADD CONSTRAINT ex_show_artist_during EXCLUDE USING gist (artist_id WITH =, during WITH &&)')
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('ALTER TABLE "show" DROP CONSTRAINT ex_show_artist_during')
+        op.execute('ALTER TABLE "show" DROP CONSTRAINT ex_show_venue_during')
+        op.execute('ALTER TABLE "show" DROP COLUMN during')
+    with op.batch_alter_table('show') as batch_op:
+        batch_op.drop_constraint('ck_show_duration_minutes', type_='check')
+        batch_op.drop_column('duration_minutes')
+    restore_partial_index()
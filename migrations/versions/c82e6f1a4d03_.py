@@ -0,0 +1,46 @@
+"""add composite indexes for profile and listing queries
+
+Revision ID: c82e6f1a4d03
+Revises: a54d07c3e1b2
+Create Date: 2026-10-18 11:48:05.227391
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c82e6f1a4d03'
+down_revision = 'a54d07c3e1b2'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_show_venue_id_start_time', 'show', ['venue_id', 'start_time']),
+    ('ix_show_artist_id_start_time', 'show', ['artist_id', 'start_time']),
+    ('ix_show_start_time_id', 'show', ['start_time', 'id']),
+    ('ix_venue_state_city_name_id', 'venue', ['state', 'city', 'name', 'id']),
+    ('ix_artist_name_id', 'artist', ['name', 'id']),
+]
+
+
+def upgrade():
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction, so on
+    # Postgres step out of the migration's transaction while building them
+    if op.get_bind().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            for name, table, columns in INDEXES:
+                op.create_index(name, table, columns, postgresql_concurrently=True)
+    else:
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            for name, table, columns in reversed(INDEXES):
+                op.drop_index(name, table_name=table, postgresql_concurrently=True)
+    else:
+        for name, table, columns in reversed(INDEXES):
+            op.drop_index(name, table_name=table)
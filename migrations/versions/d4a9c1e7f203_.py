@@ -0,0 +1,126 @@
+"""partition show by month of start_time
+
+Revision ID: d4a9c1e7f203
+Revises: b3d8e2f5a716
+Create Date: 2026-10-18 22:03:51.280414
+
+"""
+from datetime import date
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4a9c1e7f203'
+down_revision = 'b3d8e2f5a716'
+branch_labels = None
+depends_on = None
+
+# keep in step with models.Show and partitions.py
+MAX_SHOW_MINUTES = 24 * 60
+COLUMNS = 'id, artist_id, venue_id, start_time, duration_minutes, counted_as_past'
+INDEXES = [
+    ('ix_show_venue_id_start_time', ['venue_id', 'start_time']),
+    ('ix_show_artist_id_start_time', ['artist_id', 'start_time']),
+    ('ix_show_start_time_id', ['start_time', 'id']),
+]
+# month partitions made past this month; `flask partition-shows` keeps ahead
+AHEAD_MONTHS = 3
+
+TABLE = """
+CREATE TABLE "{name}" (
+    id integer NOT NULL DEFAULT nextval('show_id_seq'),
+    artist_id integer NOT NULL,
+    venue_id integer NOT NULL,
+    start_time timestamp without time zone NOT NULL,
+    duration_minutes integer NOT NULL DEFAULT 120,
+    counted_as_past boolean NOT NULL DEFAULT false,
+    during tsrange GENERATED ALWAYS AS
+        (tsrange(start_time, start_time + make_interval(mins => duration_minutes), '[)')) STORED,
+    CONSTRAINT {name}_pkey PRIMARY KEY ({key}),
+    CONSTRAINT show_artist_id_fkey FOREIGN KEY (artist_id) REFERENCES artist (id),
+    CONSTRAINT show_venue_id_fkey FOREIGN KEY (venue_id) REFERENCES venue (id),
+    CONSTRAINT ck_show_duration_minutes CHECK (duration_minutes BETWEEN 1 AND {max_minutes})
+){partitioning}
+"""
+
+
+def add_months(month, n):
+    months = month.year * 12 + month.month - 1 + n
+    return date(months // 12, months % 12 + 1, 1)
+
+
+def create_table(name, partitioned):
+    op.execute(TABLE.format(
+        name=name, max_minutes=MAX_SHOW_MINUTES,
+        key='id, start_time' if partitioned else 'id',
+        partitioning=' PARTITION BY RANGE (start_time)' if partitioned else '',
+    ))
+
+
+def create_indexes(table):
+    for name, columns in INDEXES:
+        op.create_index(name, table, columns)
+    op.create_index('ix_show_upcoming_start_time', table, ['start_time'],
+                    postgresql_where=sa.text('NOT counted_as_past'))
+
+
+def drop_indexes(table):
+    for name, columns in INDEXES + [('ix_show_upcoming_start_time', None)]:
+        op.drop_index(name, table_name=table)
+
+
+def add_exclusion_constraints(table, prefix):
+    op.execute('ALTER TABLE %s ADD CONSTRAINT %s_venue_during EXCLUDE USING gist (venue_id WITH =, during WITH &&)' % (table, prefix))
+    op.execute('ALTER TABLE %s ADD CONSTRAINT %s_artist_during EXCLUDE USING gist (artist_id WITH =, during WITH &&)' % (table, prefix))
+
+
+def upgrade():
+    # Postgres only; on other databases show stays one table
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('ALTER TABLE "show" RENAME TO show_unpartitioned')
+    op.execute('ALTER TABLE show_unpartitioned DROP CONSTRAINT ex_show_venue_during')
+    op.execute('ALTER TABLE show_unpartitioned DROP CONSTRAINT ex_show_artist_during')
+    op.execute('ALTER TABLE show_unpartitioned DROP CONSTRAINT show_pkey')
+    drop_indexes('show_unpartitioned')
+
+    create_table('show', partitioned=True)
+    create_indexes('show')
+    # exclusion constraints cannot span partitions; every partition has its own
+    first, last = op.get_bind().execute(sa.text(
+        "SELECT date_trunc('month', min(start_time))::date, date_trunc('month', max(start_time))::date"
+        ' FROM show_unpartitioned'
+    )).fetchone()
+    this_month = date.today().replace(day=1)
+    first = min(first or this_month, this_month)
+    last = add_months(max(last or this_month, this_month), AHEAD_MONTHS)
+    month = first
+    while month <= last:
+        name = 'show_p%04d_%02d' % (month.year, month.month)
+        op.execute("CREATE TABLE %s PARTITION OF \"show\" FOR VALUES FROM ('%s') TO ('%s')"
+                   % (name, month, add_months(month, 1)))
+        add_exclusion_constraints(name, name)
+        month = add_months(month, 1)
+    op.execute('CREATE TABLE show_pdefault PARTITION OF "show" DEFAULT')
+    add_exclusion_constraints('show_pdefault', 'show_pdefault')
+
+    op.execute('INSERT INTO "show" ({0}) SELECT {0} FROM show_unpartitioned'.format(COLUMNS))
+    # the sequence belongs to the old table's id and would go with it
+    op.execute('ALTER SEQUENCE show_id_seq OWNED BY "show".id')
+    op.execute('DROP TABLE show_unpartitioned')
+
+
+def downgrade():
+    # shows in archived (detached) partitions are not brought back
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    create_table('show_unpartitioned', partitioned=False)
+    op.execute('INSERT INTO show_unpartitioned ({0}) SELECT {0} FROM "show"'.format(COLUMNS))
+    op.execute('ALTER SEQUENCE show_id_seq OWNED BY show_unpartitioned.id')
+    op.execute('DROP TABLE "show"')
+    op.execute('ALTER TABLE show_unpartitioned RENAME TO "show"')
+    op.execute('ALTER TABLE "show" RENAME CONSTRAINT show_unpartitioned_pkey TO show_pkey')
+    create_indexes('show')
+    add_exclusion_constraints('"show"', 'ex_show')
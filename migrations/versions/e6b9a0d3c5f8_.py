@@ -0,0 +1,124 @@
+"""normalize genres into genre tables
+
+Revision ID: e6b9a0d3c5f8
+Revises: c82e6f1a4d03
+Create Date: 2026-10-18 12:31:40.668104
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6b9a0d3c5f8'
+down_revision = 'c82e6f1a4d03'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+# the choices offered by ArtistForm/VenueForm
+GENRES = [
+    'Alternative', 'Blues', 'Classical', 'Country', 'Electronic', 'Folk', 'Funk',
+    'Hip-Hop', 'Heavy Metal', 'Instrumental', 'Jazz', 'Musical Theatre', 'Pop',
+    'Punk', 'R&B', 'Reggae', 'Rock n Roll', 'Soul', 'Other',
+]
+
+# keep in step with search.search_document(); genres no longer live on the row
+DOCUMENT = "to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(city, ''))"
+OLD_DOCUMENT = ("to_tsvector('simple', coalesce(name, '') || ' ' || "
+                "coalesce(city, '') || ' ' || coalesce(genres, ''))")
+
+genre = sa.table('genre', sa.column('id', sa.Integer), sa.column('name', sa.String))
+
+
+def owners():
+    for table in ('artist', 'venue'):
+        owner = sa.table(table, sa.column('id', sa.Integer), sa.column('genres', sa.String))
+        link = sa.table(table + '_genre', sa.column(table + '_id', sa.Integer), sa.column('genre_id', sa.Integer))
+        yield table, owner, link
+
+
+def genre_ids(conn, names):
+    # id for every name, inserting the ones not seen yet
+    ids = dict(conn.execute(sa.select(genre.c.name, genre.c.id).where(genre.c.name.in_(names))).fetchall())
+    missing = [name for name in names if name not in ids]
+    if missing:
+        conn.execute(genre.insert(), [{'name': name} for name in missing])
+        ids.update(conn.execute(sa.select(genre.c.name, genre.c.id).where(genre.c.name.in_(missing))).fetchall())
+    return ids
+
+
+def batches(conn, query, key):
+    # walk a table in primary key order, BATCH_SIZE rows at a time
+    last = 0
+    while True:
+        rows = conn.execute(query.where(key > last).order_by(key).limit(BATCH_SIZE)).fetchall()
+        if not rows:
+            return
+        yield rows
+        last = rows[-1][0]
+
+
+def set_search_document(table, document):
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('DROP INDEX IF EXISTS ix_{0}_search_document'.format(table))
+        op.execute('CREATE INDEX ix_{0}_search_document ON {0} USING gin ({1})'.format(table, document))
+
+
+def upgrade():
+    op.create_table('genre',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=120), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    for table in ('artist', 'venue'):
+        op.create_table(table + '_genre',
+        sa.Column(table + '_id', sa.Integer(), nullable=False),
+        sa.Column('genre_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint([table + '_id'], [table + '.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['genre_id'], ['genre.id'], ),
+        sa.PrimaryKeyConstraint(table + '_id', 'genre_id')
+        )
+        op.create_index('ix_{0}_genre_genre_id_{0}_id'.format(table), table + '_genre', ['genre_id', table + '_id'])
+
+    # backfill from the comma-joined strings in batches
+    conn = op.get_bind()
+    conn.execute(genre.insert(), [{'name': name} for name in GENRES])
+    for table, owner, link in owners():
+        for rows in batches(conn, sa.select(owner.c.id, owner.c.genres), owner.c.id):
+            split = [(id, list(dict.fromkeys(g.strip() for g in (genres or '').split(',') if g.strip())))
+                     for id, genres in rows]
+            ids = genre_ids(conn, sorted(set(name for _, names in split for name in names)))
+            links = [{table + '_id': id, 'genre_id': ids[name]} for id, names in split for name in names]
+            if links:
+                conn.execute(link.insert(), links)
+
+    # dropping the column also drops the old search index built on it
+    for table in ('artist', 'venue'):
+        op.drop_column(table, 'genres')
+        set_search_document(table, DOCUMENT)
+
+
+def downgrade():
+    conn = op.get_bind()
+    for table, owner, link in owners():
+        op.add_column(table, sa.Column('genres', sa.String(length=120), nullable=True))
+        owner_id = getattr(link.c, table + '_id')
+        for rows in batches(conn, sa.select(owner.c.id), owner.c.id):
+            ids = [id for id, in rows]
+            names = {}
+            for id, name in conn.execute(
+                sa.select(owner_id, genre.c.name).select_from(link.join(genre, genre.c.id == link.c.genre_id))
+                .where(owner_id.in_(ids)).order_by(owner_id, genre.c.name)
+            ):
+                names.setdefault(id, []).append(name)
+            for id, genres in names.items():
+                conn.execute(owner.update().where(owner.c.id == id).values(genres=','.join(genres)))
+        set_search_document(table, OLD_DOCUMENT)
+
+    for table in ('venue', 'artist'):
+        op.drop_index('ix_{0}_genre_genre_id_{0}_id'.format(table), table_name=table + '_genre')
+        op.drop_table(table + '_genre')
+    op.drop_table('genre')
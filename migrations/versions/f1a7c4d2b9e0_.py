@@ -0,0 +1,37 @@
+"""add table_version for Last-Modified tracking
+
+Revision ID: f1a7c4d2b9e0
+Revises: e6b9a0d3c5f8
+Create Date: 2026-10-18 20:05:12.341877
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1a7c4d2b9e0'
+down_revision = 'e6b9a0d3c5f8'
+branch_labels = None
+depends_on = None
+
+# keep in step with the table names versions.TRACKED maps to
+TABLES = ['artist', 'venue', 'show']
+
+
+def upgrade():
+    table_version = op.create_table('table_version',
+        sa.Column('name', sa.String(length=64), nullable=False),
+        sa.Column('version', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('changed_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('name')
+    )
+    # nothing is known about earlier writes; start every table at upgrade time
+    now = datetime.utcnow().replace(microsecond=0)
+    op.bulk_insert(table_version, [{'name': name, 'version': 0, 'changed_at': now} for name in TABLES])
+
+
+def downgrade():
+    op.drop_table('table_version')
@@ -1,8 +1,49 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 
-from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.orm import Session
 
-db = SQLAlchemy()
+from database import Database
+
+db = Database()
+
+# genre membership; the primary keys serve "genres of X" and the genre-first
+# indexes serve the ?genre= listing filters
+artist_genre = db.Table('artist_genre',
+    db.Column('artist_id', db.Integer, db.ForeignKey('artist.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('genre.id'), primary_key=True),
+    db.Index('ix_artist_genre_genre_id_artist_id', 'genre_id', 'artist_id')
+)
+
+venue_genre = db.Table('venue_genre',
+    db.Column('venue_id', db.Integer, db.ForeignKey('venue.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('genre.id'), primary_key=True),
+    db.Index('ix_venue_genre_genre_id_venue_id', 'genre_id', 'venue_id')
+)
+
+class Genre(db.Model):
+    __tablename__ = 'genre'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), nullable=False, unique=True)
+
+    @classmethod
+    def named(cls, names):
+        # the Genre rows for names, creating any that do not exist yet
+        names = [name for name in dict.fromkeys(names or []) if name]
+        if not names:
+            return []
+        existing = dict((genre.name, genre) for genre in cls.query.filter(cls.name.in_(names)))
+        for name in names:
+            if name not in existing:
+                existing[name] = cls(name=name)
+                db.session.add(existing[name])
+        return [existing[name] for name in names]
+
+# a show books its artist and venue from start_time for duration_minutes;
+# the upper bound lets overlap checks scan a bounded start_time range
+DEFAULT_SHOW_MINUTES = 120
+MAX_SHOW_MINUTES = 24 * 60
 
 class Show(db.Model):
     __tablename__ = 'show'
@@ -10,6 +51,33 @@ class Show(db.Model):
     artist_id = db.Column(db.Integer, db.ForeignKey('artist.id'), nullable=False)
     venue_id = db.Column(db.Integer, db.ForeignKey('venue.id'), nullable=False)
     start_time = db.Column(db.DateTime, nullable=False)
+    duration_minutes = db.Column(db.Integer, nullable=False, default=DEFAULT_SHOW_MINUTES,
+                                 server_default=str(DEFAULT_SHOW_MINUTES))
+    # set once the show has been moved from the upcoming to the past counters
+    counted_as_past = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
+    # UTC; set on every insert and update, for the pages' ETags (see conditional.py)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow,
+                           server_default=db.func.current_timestamp())
+
+    __table_args__ = (
+        db.Index('ix_show_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_show_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_show_start_time_id', 'start_time', 'id'),
+        db.Index('ix_show_updated_at', 'updated_at'),
+        db.Index('ix_show_upcoming_start_time', 'start_time',
+                 postgresql_where=db.text('NOT counted_as_past'),
+                 sqlite_where=db.text('NOT counted_as_past')),
+        db.CheckConstraint('duration_minutes BETWEEN 1 AND %d' % MAX_SHOW_MINUTES, name='ck_show_duration_minutes'),
+        # on Postgres the migrations also add a tsrange column `during` with
+        # GiST exclusion constraints, so no two shows of one artist or one
+        # venue can overlap even when bookings race (see availability.py),
+        # and partition the table by month of start_time, with (id,
+        # start_time) as the primary key (see partitions.py)
+    )
+
+    @property
+    def end_time(self):
+        return self.start_time + timedelta(minutes=self.duration_minutes)
 
     def as_dict(self):
         return {
@@ -26,14 +94,28 @@ class Artist(db.Model):
     city = db.Column(db.String(120), nullable=False)
     state = db.Column(db.String(120), nullable=False)
     phone = db.Column(db.String(120))
-    genres = db.Column(db.String(120), nullable=False)
+    genres = db.relationship('Genre', secondary=artist_genre, order_by='Genre.name', lazy=True)
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
     website = db.Column(db.String(120))
     seeking_venue = db.Column(db.Boolean)
     seeking_description = db.Column(db.String(500))
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # UTC; counter updates and genre edits bump it too
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow,
+                           server_default=db.func.current_timestamp())
     shows = db.relationship('Show', backref='Artist', lazy=True)
 
+    __table_args__ = (
+        db.Index('ix_artist_name_id', 'name', 'id'),
+        db.Index('ix_artist_updated_at', 'updated_at'),
+    )
+
+    @property
+    def genre_names(self):
+        return [genre.name for genre in self.genres]
+
     def as_dict(self):
         return {
             'id': self.id,
@@ -43,11 +125,12 @@ class Artist(db.Model):
             'phone': self.phone,
             'image_link': self.image_link,
             'facebook_link': self.facebook_link,
-            'genres': self.genres,
+            'genres': self.genre_names,
             'website': self.website,
             'seeking_venue': self.seeking_venue,
             'seeking_description': self.seeking_description,
-            'shows': self.shows
+            'upcoming_shows_count': self.upcoming_shows_count,
+            'past_shows_count': self.past_shows_count,
         }
 
 class Venue(db.Model):
@@ -61,12 +144,26 @@ class Venue(db.Model):
     phone = db.Column(db.String(120))
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
-    genres = db.Column(db.String(120), nullable=False)
+    genres = db.relationship('Genre', secondary=venue_genre, order_by='Genre.name', lazy=True)
     website = db.Column(db.String(120))
     seeking_talent = db.Column(db.Boolean)
     seeking_description = db.Column(db.String(500))
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # UTC; counter updates and genre edits bump it too
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow,
+                           server_default=db.func.current_timestamp())
     shows = db.relationship('Show', backref='Venue', lazy=True)
 
+    __table_args__ = (
+        db.Index('ix_venue_state_city_name_id', 'state', 'city', 'name', 'id'),
+        db.Index('ix_venue_updated_at', 'updated_at'),
+    )
+
+    @property
+    def genre_names(self):
+        return [genre.name for genre in self.genres]
+
     def as_dict(self):
         return {
             'id': self.id,
@@ -77,10 +174,28 @@ class Venue(db.Model):
             'phone': self.phone,
             'image_link': self.image_link,
             'facebook_link': self.facebook_link,
-            'genres': self.genres,
+            'genres': self.genre_names,
             'website': self.website,
             'seeking_talent': self.seeking_talent,
             'seeking_description': self.seeking_description,
-            'shows': self.shows,
+            'upcoming_shows_count': self.upcoming_shows_count,
+            'past_shows_count': self.past_shows_count,
         }
 
+@event.listens_for(Session, 'before_flush')
+def _touch_updated_at(session, flush_context, instances):
+    # changing only an artist's or venue's genres updates no column of its
+    # own, so onupdate alone would not move updated_at
+    now = datetime.utcnow()
+    for obj in session.dirty:
+        if isinstance(obj, (Artist, Venue)) and session.is_modified(obj):
+            obj.updated_at = now
+
+class TableVersion(db.Model):
+    # one row per tracked table, bumped by every transaction that writes to it
+    # (see versions.py); cheap to read, so it backs Last-Modified checks
+    __tablename__ = 'table_version'
+
+    name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    changed_at = db.Column(db.DateTime, nullable=False)
@@ -0,0 +1,194 @@
+import gzip
+import threading
+import time
+from datetime import datetime
+
+from flask import Response, current_app, g, has_app_context, request, session
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from werkzeug.local import LocalProxy
+
+from cache import ByteLRUCache
+from versions import table_versions
+
+# Rendered HTML for the listing and profile pages, gzip-compressed, in a
+# process-local LRU bounded by PAGE_CACHE_BYTES. An entry's key is the
+# endpoint, its URL arguments and the table_version of every table the page
+# reads, so any committed write to those tables (forms, deletes, imports,
+# counter updates) makes the old entries unreachable and they age out. A hit
+# costs no query, no template and no compression: gzip clients get the
+# stored bytes as they are.
+#
+# The versions are read at most every PAGE_CACHE_VERSION_TTL seconds per
+# process, and at once after this process commits a write, so a write handled
+# by another worker shows up here within that time. A miss reads them again
+# through the request's session before rendering, from the same database
+# (primary or replica) the page is read from, so no entry is ever stored
+# under a newer version than its data. Pages are not cached while the
+# session holds flashed messages, or if rendering changed the session.
+#
+# Profile pages also split their shows at the time they were rendered, which
+# no table version tracks, so a view can call expire_page() with the start of
+# its soonest upcoming show and the entry reads as a miss from then on.
+
+# endpoint -> tables its page reads
+PAGES = {
+    'venues.venues': ('venue',),
+    'artists.artists': ('artist',),
+    'shows.shows': ('show', 'artist', 'venue'),
+    'venues.show_venue': ('venue', 'show', 'artist'),
+    'artists.show_artist': ('artist', 'show', 'venue'),
+}
+
+
+def expire_page(when):
+    # the page being rendered goes stale at `when` (a naive local datetime)
+    expires = g.get('page_cache_expires')
+    if expires is None or when < expires:
+        g.page_cache_expires = when
+
+
+class PageCache(object):
+
+    def __init__(self):
+        self.store = None
+        self.lock = threading.Lock()
+        # table -> (version, when it was read)
+        self.versions = {}
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def init_app(self, app):
+        config = app.config
+        config.setdefault('PAGE_CACHE', True)
+        config.setdefault('PAGE_CACHE_BYTES', 32 * 1024 * 1024)
+        config.setdefault('PAGE_CACHE_VERSION_TTL', 1.0)
+        config.setdefault('PAGE_CACHE_LEVEL', 6)
+        self.store = ByteLRUCache(config['PAGE_CACHE_BYTES'])
+        self.ttl = config['PAGE_CACHE_VERSION_TTL']
+        self.level = config['PAGE_CACHE_LEVEL']
+        if config['PAGE_CACHE']:
+            app.before_request(self.serve)
+            app.after_request(self.save)
+        app.extensions['page_cache'] = self
+
+    def forget_versions(self):
+        with self.lock:
+            self.versions.clear()
+            self.generation += 1
+
+    def current_versions(self, tables):
+        # (versions, whether just read) for the tables, from the memo while
+        # it is fresh; a client that has just written reads them every time
+        now = time.monotonic()
+        with self.lock:
+            memo = [self.versions.get(table) for table in tables]
+        if session.get('db_primary_until', 0) <= time.time() and all(
+                entry is not None and now - entry[1] < self.ttl for entry in memo):
+            return dict((table, entry[0]) for table, entry in zip(tables, memo)), False
+        return self.read_versions(tables), True
+
+    def read_versions(self, tables):
+        with self.lock:
+            generation = self.generation
+        read = time.monotonic()
+        versions = table_versions(*tables)
+        with self.lock:
+            # unless a commit here made them out of date meanwhile
+            if generation == self.generation:
+                self.versions.update((table, (version, read)) for table, version in versions.items())
+        return versions
+
+    @staticmethod
+    def key(versions):
+        args = sorted(request.args.items(multi=True))
+        return (request.endpoint, tuple(sorted((request.view_args or {}).items())),
+                tuple(args), tuple(sorted(versions.items())))
+
+    def serve(self):
+        g.page_cache_key = None
+        g.page_cache_expires = None
+        tables = PAGES.get(request.endpoint)
+        if tables is None or request.method != 'GET' or '_flashes' in session:
+            return None
+        versions, fresh = self.current_versions(tables)
+        key = self.key(versions)
+        entry = self.store.get(key)
+        if entry is not None and entry[2] is not None and entry[2] <= datetime.now():
+            self.store.delete(key)
+            entry = None
+        if entry is not None:
+            self.hits += 1
+            return self.respond(entry[0], entry[1])
+        self.misses += 1
+        if not fresh:
+            versions = self.read_versions(tables)
+        g.page_cache_key = self.key(versions)
+        return None
+
+    def respond(self, body, mimetype):
+        if request.accept_encodings['gzip']:
+            response = Response(body, mimetype=mimetype)
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            response = Response(gzip.decompress(body), mimetype=mimetype)
+        response.headers['Vary'] = 'Accept-Encoding'
+        response.headers['X-Page-Cache'] = 'hit'
+        return response
+
+    def cacheable(self, response):
+        return (response.status_code == 200 and not session.modified and '_flashes' not in session
+                and 'Content-Encoding' not in response.headers)
+
+    def save(self, response):
+        key = g.pop('page_cache_key', None)
+        expires = g.pop('page_cache_expires', None)
+        if key is None or not self.cacheable(response):
+            return response
+        response.headers['X-Page-Cache'] = 'miss'
+        if response.is_streamed:
+            # keep streaming; the page is stored once the last chunk is out
+            response.response = self.collect(key, response.iter_encoded(), response.mimetype, expires)
+            response.headers['Vary'] = 'Accept-Encoding'
+            return response
+        body = gzip.compress(response.get_data(), self.level)
+        self.store.set(key, (body, response.mimetype, expires))
+        response.headers['Vary'] = 'Accept-Encoding'
+        if request.accept_encodings['gzip']:
+            response.set_data(body)
+            response.headers['Content-Encoding'] = 'gzip'
+        return response
+
+    def collect(self, key, chunks, mimetype, expires):
+        body = []
+        for chunk in chunks:
+            body.append(chunk)
+            yield chunk
+        # a client that disconnects early closes this generator first
+        self.store.set(key, (gzip.compress(b''.join(body), self.level), mimetype, expires))
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': float(self.hits) / lookups if lookups else 0.0,
+            'evictions': self.store.evictions if self.store else 0,
+            'size': self.store.size() if self.store else 0,
+            'bytes': self.store.bytes if self.store else 0,
+        }
+
+
+# the current app's page cache; create_app() gives every app its own, so two
+# apps in one process (on different databases) never share pages
+page_cache = LocalProxy(lambda: current_app.extensions['page_cache'])
+
+
+@event.listens_for(Session, 'after_commit')
+def _forget_page_versions(db_session):
+    # this process just wrote; read the versions again on the next request
+    if db_session.info.pop('tables_bumped', None) and has_app_context():
+        cache = current_app.extensions.get('page_cache')
+        if cache is not None:
+            cache.forget_versions()
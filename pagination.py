@@ -0,0 +1,130 @@
+import base64
+import json
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from datetime import datetime
+
+from flask import current_app, request
+from sqlalchemy import DateTime, Integer, String, tuple_
+
+# one page of rows plus the opaque cursors pointing either side of it
+Page = namedtuple('Page', ['items', 'next_cursor', 'prev_cursor', 'per_page'])
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(values):
+    values = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps(values, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, keys):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw.decode('utf-8'))
+    except ValueError:
+        raise InvalidCursor(cursor)
+    if not isinstance(values, list) or len(values) != len(keys):
+        raise InvalidCursor(cursor)
+    try:
+        return [cursor_value(key, value) for key, value in zip(keys, values)]
+    except (TypeError, ValueError):
+        raise InvalidCursor(cursor)
+
+
+def cursor_value(key, value):
+    # a cursor value checked against its sort key's column, so a forged
+    # cursor never reaches the database; json has no datetime, so those are
+    # restored from ISO strings
+    if value is None:
+        if getattr(getattr(key, 'expression', key), 'nullable', False):
+            return None
+        raise ValueError('NULL for a NOT NULL key')
+    if isinstance(key.type, DateTime):
+        if not isinstance(value, str):
+            raise TypeError(value)
+        return datetime.fromisoformat(value)
+    if isinstance(key.type, Integer):
+        if not isinstance(value, int) or isinstance(value, bool):
+            raise TypeError(value)
+    elif isinstance(key.type, String):
+        if not isinstance(value, str):
+            raise TypeError(value)
+    return value
+
+
+def page_args():
+    # cursor and page size for keyset_page/ranked_page, taken from the query string
+    per_page = request.args.get('per_page', current_app.config['PAGE_SIZE'], type=int)
+    return {
+        'after': request.args.get('after'),
+        'before': request.args.get('before'),
+        'per_page': max(1, min(per_page, current_app.config['MAX_PAGE_SIZE']))
+    }
+
+
+def keyset_page(query, keys, after=None, before=None, per_page=20):
+    # seek past the cursor with a row-value comparison on the sort keys
+    # instead of OFFSET, so every page costs the same index range scan.
+    # the keys must be selected by the query and end in a unique column.
+    query = query.order_by(None)
+    if before:
+        query = query.filter(tuple_(*keys) < tuple_(*decode_cursor(before, keys)))
+        query = query.order_by(*[key.desc() for key in keys])
+    else:
+        if after:
+            query = query.filter(tuple_(*keys) > tuple_(*decode_cursor(after, keys)))
+        query = query.order_by(*keys)
+
+    # fetch one extra row to learn whether another page follows
+    rows = query.limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if before:
+        rows.reverse()
+
+    def cursor_of(row):
+        return encode_cursor([getattr(row, key.key) for key in keys])
+
+    next_cursor = prev_cursor = None
+    if rows:
+        if has_more or before:
+            next_cursor = cursor_of(rows[-1])
+        if (has_more and before) or after:
+            prev_cursor = cursor_of(rows[0])
+    return Page(rows, next_cursor, prev_cursor, per_page)
+
+
+def ranked_page(ranked, after=None, before=None, per_page=20):
+    # page through an in-memory list of (score, name, id) already sorted best
+    # first; the cursor is the full tuple so ties on score stay in order
+    order = [(-score, name, id) for score, name, id in ranked]
+
+    def position(cursor):
+        try:
+            score, name, id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        except (TypeError, ValueError):
+            raise InvalidCursor(cursor)
+        if (not isinstance(score, (int, float)) or isinstance(score, bool) or not isinstance(name, str)
+                or not isinstance(id, int) or isinstance(id, bool)):
+            raise InvalidCursor(cursor)
+        return (-score, name, id)
+
+    if before:
+        end = bisect_left(order, position(before))
+        start = max(0, end - per_page)
+    else:
+        start = bisect_right(order, position(after)) if after else 0
+        end = start + per_page
+    rows = ranked[start:end]
+
+    next_cursor = prev_cursor = None
+    if rows:
+        if end < len(ranked):
+            next_cursor = encode_cursor(rows[-1])
+        if start > 0:
+            prev_cursor = encode_cursor(rows[0])
+    return Page(rows, next_cursor, prev_cursor, per_page)
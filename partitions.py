@@ -0,0 +1,130 @@
+import re
+from datetime import date
+
+from sqlalchemy import text
+
+from models import db, Artist, Venue
+from counters import uncount
+from versions import touch
+
+# On Postgres the show table is range-partitioned by start_time, one
+# partition per calendar month (show_pYYYY_MM), plus show_pdefault for
+# anything no month partition covers yet. Queries that bound start_time
+# (upcoming shows, roll_forward, booking checks, the shows API's keyset
+# pages) only scan the partitions in that range; old months can be detached
+# and archived without touching the rest of the table.
+#
+# `flask partition-shows` keeps this up: it creates the next months'
+# partitions before shows are booked into them and moves old months out.
+# Exclusion constraints cannot span partitions, so each partition gets its
+# own (see availability.py for the check that covers the month boundary).
+
+PARTITION = re.compile(r'^show_p(\d{4})_(\d{2})$')
+DEFAULT_PARTITION = 'show_pdefault'
+ARCHIVE_SCHEMA = 'archive'
+
+# keep in step with Show; `during` is generated and never written
+COLUMNS = 'id, artist_id, venue_id, start_time, duration_minutes, counted_as_past, updated_at'
+
+
+def month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def add_months(month, n):
+    months = month.year * 12 + month.month - 1 + n
+    return date(months // 12, months % 12 + 1, 1)
+
+
+def partition_name(month):
+    return 'show_p%04d_%02d' % (month.year, month.month)
+
+
+def is_partitioned():
+    if db.engine.dialect.name != 'postgresql':
+        return False
+    return bool(db.session.execute(text(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('\"show\"')"
+    )).scalar())
+
+
+def partitions():
+    # the months of the show table's month partitions, in order
+    names = db.session.execute(text(
+        'SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid'
+        " WHERE i.inhparent = '\"show\"'::regclass"
+    )).scalars()
+    months = []
+    for name in names:
+        match = PARTITION.match(name)
+        if match:
+            months.append(date(int(match.group(1)), int(match.group(2)), 1))
+    return sorted(months)
+
+
+def add_exclusion_constraints(name):
+    db.session.execute(text(
+        'ALTER TABLE %s ADD CONSTRAINT %s_venue_during EXCLUDE USING gist (venue_id WITH =, during WITH &&)' % (name, name)
+    ))
+    db.session.execute(text(
+        'ALTER TABLE %s ADD CONSTRAINT %s_artist_during EXCLUDE USING gist (artist_id WITH =, during WITH &&)' % (name, name)
+    ))
+
+
+def create_partition(month):
+    # a new table for the month, filled with the month's shows from the
+    # default partition (Postgres refuses to attach a partition while the
+    # default one holds rows for its range), then attached
+    name, start, end = partition_name(month), month, add_months(month, 1)
+    db.session.execute(text(
+        'CREATE TABLE %s (LIKE "show" INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING GENERATED)' % name
+    ))
+    db.session.execute(text(
+        'WITH moved AS (DELETE FROM {default} WHERE start_time >= :start AND start_time < :end RETURNING {columns})'
+        ' INSERT INTO {name} ({columns}) SELECT {columns} FROM moved'.format(
+            default=DEFAULT_PARTITION, name=name, columns=COLUMNS)
+    ), {'start': start, 'end': end})
+    # partition bounds must be literals; both are dates made here
+    db.session.execute(text(
+        "ALTER TABLE \"show\" ATTACH PARTITION %s FOR VALUES FROM ('%s') TO ('%s')" % (name, start, end)
+    ))
+    add_exclusion_constraints(name)
+    return name
+
+
+def ensure_partitions(ahead, today=None):
+    # partitions for this month and the next `ahead` months; returns the new
+    # partitions' names
+    first = month_start(today or date.today())
+    existing = set(partitions())
+    return [create_partition(add_months(first, n)) for n in range(ahead + 1)
+            if add_months(first, n) not in existing]
+
+
+def archive_partitions(before, drop=False):
+    # detach every month partition ending by `before` and move it to the
+    # archive schema (or drop it). Its shows come off the counters, so
+    # returns ({Artist: ids, Venue: ids} whose pages changed, names)
+    touched, names = {Artist: set(), Venue: set()}, []
+    for month in partitions():
+        if add_months(month, 1) > before:
+            break
+        name = partition_name(month)
+        rows = db.session.execute(text(
+            'SELECT artist_id, venue_id, counted_as_past, count(*) FROM %s'
+            ' GROUP BY artist_id, venue_id, counted_as_past' % name
+        )).fetchall()
+        uncount(rows)
+        touched[Artist].update(row[0] for row in rows)
+        touched[Venue].update(row[1] for row in rows)
+        db.session.execute(text('ALTER TABLE "show" DETACH PARTITION %s' % name))
+        if drop:
+            db.session.execute(text('DROP TABLE %s' % name))
+        else:
+            db.session.execute(text('CREATE SCHEMA IF NOT EXISTS %s' % ARCHIVE_SCHEMA))
+            db.session.execute(text('ALTER TABLE %s SET SCHEMA %s' % (name, ARCHIVE_SCHEMA)))
+        names.append(name)
+    if names:
+        # DDL goes around the session's statement events
+        touch(db.session, 'show')
+    return touched, names
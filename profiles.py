@@ -0,0 +1,57 @@
+from collections import namedtuple
+from datetime import datetime
+
+from cache import entity_cache
+from models import db
+from queries import profile_rows, PROFILE_SHOW, PROFILE_COUNT, PROFILE_GENRE, PROFILE_ENTITY
+from routing import use_primary
+
+# Venue and artist profile pages: the venue or artist with its upcoming and
+# past shows. One statement reads the upcoming shows, at most past_limit of
+# the most recent past shows and the number of past shows, split at now by
+# the database, together with the entity's own columns and genres when the
+# entity cache misses (see queries.profile_rows). Shows starting now or later
+# are upcoming (soonest first), the rest are past (most recent first).
+
+Profile = namedtuple('Profile', 'entity upcoming past upcoming_count past_count')
+
+
+def profile_query(model, id, past_limit=None, now=None):
+    # (cached entity or None, the statement still to run for the profile)
+    now = now or datetime.today()
+    entity = entity_cache.lookup(model, id)
+    return entity, profile_rows(model, id, now, past_limit, with_entity=entity is None)
+
+
+def build_profile(model, id, entity, rows):
+    # a Profile from the rows of profile_query(), or None if the entity is gone
+    upcoming, past, past_count, data, genres = [], [], 0, None, []
+    for row in rows:
+        kind = row[0]
+        if kind == 'upcoming':
+            upcoming.append(tuple(row[PROFILE_SHOW]))
+        elif kind == 'past':
+            past.append(tuple(row[PROFILE_SHOW]))
+        elif kind == 'past_count':
+            past_count = row[PROFILE_COUNT]
+        elif kind == 'entity':
+            data = dict(zip([column.key for column in model.__table__.columns], row[PROFILE_ENTITY:]))
+        elif kind == 'genre':
+            genres.append(row[PROFILE_GENRE])
+    if entity is None:
+        if data is None:
+            return None
+        data['genre_names'] = sorted(genres)
+        entity = entity_cache.store(model, id, data)
+    upcoming.sort(key=lambda show: show[0])
+    past.sort(key=lambda show: show[0], reverse=True)
+    return Profile(entity, upcoming, past, len(upcoming), past_count)
+
+
+def load_profile(model, id, past_limit=None):
+    entity, statement = profile_query(model, id, past_limit)
+    if entity is not None:
+        return build_profile(model, id, entity, db.session.execute(statement).all())
+    # the entity goes into the cache, so it is read from the primary
+    with use_primary():
+        return build_profile(model, id, entity, db.session.execute(statement).all())
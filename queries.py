@@ -0,0 +1,134 @@
+from itertools import groupby
+
+from sqlalchemy import Integer, String, cast, func, literal_column, null, select, union_all
+
+from models import db, Artist, Venue, Show, Genre, artist_genre, venue_genre
+
+# sort keys used for keyset pagination; each ends in the primary key so the
+# order is total even when names or start times repeat
+VENUE_AREA_KEYS = (Venue.state, Venue.city, Venue.name, Venue.id)
+ARTIST_KEYS = (Artist.name, Artist.id)
+SHOW_KEYS = (Show.start_time, Show.id)
+
+
+def venue_area_rows():
+    # every venue with its upcoming show count, read from the counter column
+    return db.session.query(
+        Venue.city, Venue.state, Venue.id, Venue.name,
+        Venue.upcoming_shows_count.label('num_upcoming_shows')
+    )
+
+
+def with_genre(query, model, genre):
+    # narrow a listing to one genre: genre name -> id, then the genre-first
+    # association index straight to the matching artists or venues
+    if not genre:
+        return query
+    link = artist_genre if model is Artist else venue_genre
+    owner = link.c.artist_id if model is Artist else link.c.venue_id
+    return query.join(link, owner == model.id).join(
+        Genre, Genre.id == link.c.genre_id
+    ).filter(Genre.name == genre)
+
+
+def group_venue_areas(rows):
+    # fold rows ordered by state/city into the city -> venues tree the template expects
+    areas = []
+    for (city, state), venues in groupby(rows, key=lambda row: (row.city, row.state)):
+        areas.append({
+            'city': city,
+            'state': state,
+            'venues': [{
+                'id': venue.id,
+                'name': venue.name,
+                'num_upcoming_shows': venue.num_upcoming_shows
+            } for venue in venues]
+        })
+    return areas
+
+
+def show_rows():
+    # only the columns pages/shows.html renders, joined in one statement
+    return db.session.query(
+        Show.id, Show.start_time, Show.duration_minutes,
+        Show.venue_id, Venue.name.label('venue_name'),
+        Show.artist_id, Artist.name.label('artist_name'),
+        Artist.image_link.label('artist_image_link')
+    ).join(Venue, Show.venue_id == Venue.id).join(
+        Artist, Show.artist_id == Artist.id
+    )
+
+
+def iter_shows(batch_size=100):
+    # the full feed, fetched from the cursor batch_size rows at a time
+    return show_rows().order_by(*SHOW_KEYS).yield_per(batch_size)
+
+
+# the columns of a profile_rows() row after its kind: a show's start time and
+# the other side's id, name and image, the past show count, a genre name,
+# then (with_entity) the venue's (artist's) own columns
+PROFILE_SHOW = slice(1, 5)
+PROFILE_COUNT = 5
+PROFILE_GENRE = 6
+PROFILE_ENTITY = 7
+
+
+def profile_rows(model, id, now, past_limit=None, with_entity=False):
+    # everything a venue's (artist's) page reads, in one statement: a UNION
+    # ALL of rows tagged with their kind -- every 'upcoming' show, the latest
+    # past_limit 'past' shows, the 'past_count' and, with_entity, the
+    # 'entity' row and a 'genre' row per genre, with the columns an arm
+    # does not use left NULL. The show arms are range scans on
+    # ix_show_venue_id_start_time (ix_show_artist_id_...) with only the other
+    # side joined; the rest are key lookups
+    other = Artist if model is Venue else Venue
+    owner_id = Show.venue_id if model is Venue else Show.artist_id
+    other_id = Show.artist_id if model is Venue else Show.venue_id
+    link = artist_genre if model is Artist else venue_genre
+    link_owner = link.c.artist_id if model is Artist else link.c.venue_id
+    show_columns = [Show.start_time, other.id, other.name, other.image_link]
+    entity_columns = list(model.__table__.columns) if with_entity else []
+    types = [column.type for column in show_columns] + [Integer(), String()] + [
+        column.type for column in entity_columns]
+
+    def columns(kind, first, *values):
+        # the kind, then values from column `first` on, NULL everywhere else
+        padded = [cast(null(), type_) for type_ in types]
+        padded[first - 1:first - 1 + len(values)] = values
+        return [literal_column("'%s'" % kind)] + padded
+
+    def shows(*criteria):
+        return select(*show_columns).join_from(Show, other, other_id == other.id).where(owner_id == id, *criteria)
+
+    past = shows(Show.start_time < now).order_by(Show.start_time.desc())
+    if past_limit is not None:
+        past = past.limit(past_limit)
+    past = past.subquery()
+    arms = [
+        shows(Show.start_time >= now).with_only_columns(*columns('upcoming', PROFILE_SHOW.start, *show_columns)),
+        select(*columns('past', PROFILE_SHOW.start, *past.c)),
+        select(*columns('past_count', PROFILE_COUNT, func.count())).select_from(Show).where(
+            owner_id == id, Show.start_time < now),
+    ]
+    if with_entity:
+        arms += [
+            select(*columns('entity', PROFILE_ENTITY, *entity_columns)).where(model.id == id),
+            select(*columns('genre', PROFILE_GENRE, Genre.name)).join_from(
+                link, Genre, Genre.id == link.c.genre_id).where(link_owner == id),
+        ]
+    return union_all(*arms)
+
+
+def explain(query):
+    # the database's plan for a query or statement, one line per step
+    session = db.session
+    compiled = getattr(query, 'statement', query).compile(dialect=session.bind.dialect)
+    if compiled.positional:
+        params = tuple(compiled.params[name] for name in compiled.positiontup)
+    else:
+        params = compiled.params
+    if session.bind.dialect.name == 'sqlite':
+        rows = session.connection().exec_driver_sql('EXPLAIN QUERY PLAN ' + str(compiled), params)
+        return [row[-1] for row in rows]
+    rows = session.connection().exec_driver_sql('EXPLAIN ' + str(compiled), params)
+    return [row[0].strip() for row in rows]
@@ -0,0 +1,193 @@
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import current_app, g, has_request_context, request, session
+from flask_sqlalchemy import SignallingSession
+from sqlalchemy import event, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.sql.dml import UpdateBase
+from werkzeug.local import LocalProxy
+
+# Read-replica routing. Replicas are SQLALCHEMY_BINDS entries (see
+# DB_REPLICA_BINDS in config.py). GET and HEAD requests read from a healthy
+# replica; everything else, the views that write (delete_* and *_submission,
+# whatever their method), every flush and every INSERT/UPDATE/DELETE goes to
+# the primary, and once a request has written, the rest of it reads the
+# primary too. A client that wrote keeps reading the primary for
+# DB_REPLICA_STICKY_SECONDS (a timestamp in its session cookie), so it sees
+# its own change however far the replicas lag. The timestamp only works if
+# every worker can read the cookie, so replicas need a SECRET_KEY shared by
+# all of them.
+#
+# Replicas are checked at most every DB_REPLICA_CHECK_INTERVAL seconds when
+# a request picks one: a connection must open and, on Postgres, replay lag
+# must be under DB_REPLICA_MAX_LAG seconds. A replica whose connection drops
+# is marked down at once. With no healthy replica, reads go to the primary.
+
+
+def writes(endpoint):
+    # views that write read the primary from the start, so what they read
+    # before their first write (e.g. the counts remove_shows() takes off the
+    # counters) is not from a replica that has yet to catch up
+    name = (endpoint or '').rpartition('.')[2]
+    return name.startswith('delete_') or name.endswith('_submission')
+
+
+def replica_keys(config):
+    keys = config['DB_REPLICA_BINDS']
+    if keys is None:
+        binds = config.get('SQLALCHEMY_BINDS') or {}
+        keys = sorted(key for key in binds if key.startswith('replica'))
+    return keys
+
+
+class Replica(object):
+
+    def __init__(self, key):
+        self.key = key
+        self.healthy = True
+        self.checked = 0.0
+        self.failures = 0
+
+
+class ReplicaSet(object):
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.replicas = {}
+        self.watched = set()
+        self.turn = itertools.count()
+        self.reads = {'replica': 0, 'primary': 0, 'sticky': 0}
+
+    def init_app(self, app):
+        config = app.config
+        config.setdefault('DB_REPLICA_BINDS', None)
+        config.setdefault('DB_REPLICA_STICKY_SECONDS', 5)
+        config.setdefault('DB_REPLICA_CHECK_INTERVAL', 10)
+        config.setdefault('DB_REPLICA_MAX_LAG', 10)
+        app.before_request(self.route_request)
+        app.after_request(self.remember_write)
+        if replica_keys(config) and not config.get('SECRET_KEY'):
+            raise RuntimeError('read replicas need a SECRET_KEY shared by every worker; set SECRET_KEY')
+        app.extensions['replicas'] = self
+
+    def keys(self):
+        return replica_keys(current_app.config)
+
+    def engine(self, key):
+        db = current_app.extensions['sqlalchemy'].db
+        engine = db.get_engine(current_app, bind=key)
+        if engine not in self.watched:
+            event.listen(engine, 'handle_error', lambda context: self.failed(key, context))
+            self.watched.add(engine)
+        return engine
+
+    def replica(self, key):
+        with self.lock:
+            if key not in self.replicas:
+                self.replicas[key] = Replica(key)
+            return self.replicas[key]
+
+    def failed(self, key, context):
+        # a dropped or refused connection takes the replica out of rotation
+        # until its next check; query errors (timeouts, bad SQL) do not
+        if context.is_disconnect or context.connection is None:
+            replica = self.replica(key)
+            replica.healthy = False
+            replica.checked = time.monotonic()
+            replica.failures += 1
+
+    def lag(self, connection):
+        # seconds the replica is behind the primary, None if it cannot say
+        if connection.dialect.name != 'postgresql':
+            connection.execute(text('SELECT 1'))
+            return None
+        return connection.execute(text(
+            'SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0'
+            ' ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END'
+        )).scalar()
+
+    def check(self, replica, engine):
+        try:
+            with engine.connect() as connection:
+                lag = self.lag(connection)
+            healthy = lag is None or lag <= current_app.config['DB_REPLICA_MAX_LAG']
+        except DBAPIError:
+            healthy = False
+        if replica.healthy and not healthy:
+            replica.failures += 1
+        replica.healthy = healthy
+        replica.checked = time.monotonic()
+
+    def pick(self):
+        # the next healthy replica's engine in turn, or None for the primary
+        keys = self.keys()
+        if not keys:
+            return None
+        start = next(self.turn)
+        interval = current_app.config['DB_REPLICA_CHECK_INTERVAL']
+        for i in range(len(keys)):
+            key = keys[(start + i) % len(keys)]
+            replica = self.replica(key)
+            engine = self.engine(key)
+            if time.monotonic() - replica.checked >= interval:
+                self.check(replica, engine)
+            if replica.healthy:
+                return engine
+        return None
+
+    def route_request(self):
+        g.db_replica = None
+        if request.method not in ('GET', 'HEAD') or writes(request.endpoint) or not self.keys():
+            return
+        if session.get('db_primary_until', 0) > time.time():
+            self.reads['sticky'] += 1
+            return
+        g.db_replica = self.pick()
+        self.reads['replica' if g.db_replica is not None else 'primary'] += 1
+
+    def remember_write(self, response):
+        if g.get('db_wrote') and self.keys():
+            session['db_primary_until'] = time.time() + current_app.config['DB_REPLICA_STICKY_SECONDS']
+        return response
+
+    def stats(self):
+        stats = dict(('reads_' + name, count) for name, count in self.reads.items())
+        for key, replica in sorted(self.replicas.items()):
+            stats[key + '_healthy'] = int(replica.healthy)
+            stats[key + '_failures'] = replica.failures
+        return stats
+
+
+# the current app's replicas and their health, configured by create_app()
+replicas = LocalProxy(lambda: current_app.extensions['replicas'])
+
+
+@contextmanager
+def use_primary():
+    # read from the primary inside the block, e.g. to fill a cache that must
+    # not keep a row a lagging replica has not caught up on
+    previous = g.get('db_primary', False)
+    g.db_primary = True
+    try:
+        yield
+    finally:
+        g.db_primary = previous
+
+
+class RoutingSession(SignallingSession):
+
+    def get_bind(self, mapper=None, clause=None):
+        if not has_request_context():
+            return SignallingSession.get_bind(self, mapper, clause)
+        if self._flushing or isinstance(clause, UpdateBase):
+            g.db_wrote = True
+        replica = g.get('db_replica')
+        if replica is None or g.get('db_wrote') or g.get('db_primary'):
+            return SignallingSession.get_bind(self, mapper, clause)
+        if mapper is not None and mapper.persist_selectable.info.get('bind_key') is not None:
+            # models on a bind of their own are not replicated
+            return SignallingSession.get_bind(self, mapper, clause)
+        return replica
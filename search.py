@@ -0,0 +1,208 @@
+import re
+from collections import defaultdict
+
+from flask import current_app
+from sqlalchemy import func, literal_column, or_
+
+from models import db, Artist, Venue, Genre, artist_genre, venue_genre
+from versions import table_versions
+
+WORD = re.compile(r'\w+', re.UNICODE)
+
+
+def escape_like(term):
+    # make % and _ in the search term match themselves
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def tokenize(text):
+    return WORD.findall((text or '').lower())
+
+
+def trigrams(text):
+    # the same trigrams pg_trgm extracts: each word lowercased and padded
+    # with two spaces in front and one behind
+    grams = set()
+    for word in tokenize(text):
+        padded = '  ' + word + ' '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def substring_grams(text):
+    # every 3-character substring of the lowered text, spaces and punctuation
+    # included, so the grams of any longer substring of it are among them
+    text = (text or '').lower()
+    return set(text[i:i + 3] for i in range(len(text) - 2))
+
+
+def similarity(a, b):
+    # pg_trgm's similarity(): shared trigrams over all distinct trigrams
+    a, b = trigrams(a), trigrams(b)
+    if not a or not b:
+        return 0.0
+    shared = len(a & b)
+    return shared / float(len(a) + len(b) - shared)
+
+
+#----------------------------------------------------------------------------#
+# Postgres: pg_trgm + tsvector, backed by the indexes from migrations
+# 3f1c2b8e9d47 and e6b9a0d3c5f8; genres match through the genre tables
+#----------------------------------------------------------------------------#
+
+def search_document(model):
+    # must stay textually identical to the expression index in the migration
+    return func.to_tsvector(
+        literal_column("'simple'"),
+        func.coalesce(model.name, literal_column("''")) + literal_column("' '") +
+        func.coalesce(model.city, literal_column("''"))
+    )
+
+
+class PostgresSearch(object):
+
+    def genre_matches(self, model, term):
+        # ids of the artists (venues) with the genre, through the genre-first
+        # ix_artist_genre_genre_id_artist_id (ix_venue_genre_...)
+        link = artist_genre if model is Artist else venue_genre
+        owner = link.c.artist_id if model is Artist else link.c.venue_id
+        return [id for id, in db.session.query(owner).join(Genre, Genre.id == link.c.genre_id).filter(
+            func.lower(Genre.name) == term.lower()
+        )]
+
+    def search(self, model, term, limit):
+        query = db.session.query(model.name, model.id)
+        if not term:
+            rows = query.order_by(model.name, model.id).limit(limit).all()
+            return sorted((0.0, name, id) for name, id in rows)
+
+        pattern = '%' + escape_like(term) + '%'
+        document = search_document(model)
+        tsquery = func.plainto_tsquery(literal_column("'simple'"), term)
+        score = func.similarity(model.name, term) + func.ts_rank(document, tsquery)
+        arms = [
+            model.name.ilike(pattern, escape='\\'),
+            model.city.ilike(pattern, escape='\\'),
+            document.op('@@')(tsquery),
+        ]
+        # genre matches are looked up first, so every arm is a plain index
+        # condition and Postgres can BitmapOr the trigram, tsvector and
+        # primary key indexes (a correlated EXISTS here forces a seq scan)
+        genre_ids = self.genre_matches(model, term)
+        if genre_ids:
+            arms.append(model.id.in_(genre_ids))
+        rows = db.session.query(score.label('score'), model.name, model.id).filter(or_(*arms)).order_by(
+            score.desc(), model.name, model.id
+        ).limit(limit).all()
+        return sorted(
+            ((round(score, 6), name, id) for score, name, id in rows),
+            key=lambda row: (-row[0], row[1], row[2])
+        )
+
+
+#----------------------------------------------------------------------------#
+# Fallback: in-process inverted index (SQLite and other databases)
+#----------------------------------------------------------------------------#
+
+class InvertedIndex(object):
+    # word -> ids for the full-text part, 3-gram -> ids for substring
+    # candidates and genre -> ids. It remembers the model's table_version
+    # (which genre link changes bump too) it was built at and is rebuilt the
+    # first time it is used after any process commits a write
+
+    def __init__(self, model):
+        self.model = model
+        self.version = None
+        self.docs = {}
+        self.words = defaultdict(set)
+        self.grams = defaultdict(set)
+        self.genres = defaultdict(set)
+
+    def build(self, version):
+        # build into fresh maps and swap them in, so concurrent readers never
+        # see a half-built index; version is read before the rows, so a write
+        # meanwhile only causes another rebuild
+        model = self.model
+        docs, words_index, grams_index = {}, defaultdict(set), defaultdict(set)
+        genres_index = defaultdict(set)
+        link = artist_genre if model is Artist else venue_genre
+        owner = link.c.artist_id if model is Artist else link.c.venue_id
+        genre_rows = db.session.query(owner, Genre.name).join(Genre, Genre.id == link.c.genre_id)
+        for id, genre in genre_rows:
+            genres_index[genre.lower()].add(id)
+        rows = db.session.query(model.id, model.name, model.city)
+        for id, name, city in rows:
+            words = tokenize(name) + tokenize(city)
+            docs[id] = (name, (name or '').lower(), (city or '').lower(), words)
+            for word in words:
+                words_index[word].add(id)
+            for gram in substring_grams(name) | substring_grams(city):
+                grams_index[gram].add(id)
+        self.docs, self.words, self.grams, self.genres = docs, words_index, grams_index, genres_index
+        self.version = version
+
+    def candidates(self, term):
+        # every row containing the term as a substring (as ILIKE matches it,
+        # across spaces and punctuation) also contains all of its 3-grams;
+        # short terms have none, so check every row
+        inner = substring_grams(term)
+        if not inner:
+            return set(self.docs)
+        postings = [self.grams.get(gram, set()) for gram in inner]
+        return set.intersection(*postings)
+
+    def search(self, term, limit):
+        table = self.model.__tablename__
+        version = table_versions(table)[table]
+        if version != self.version:
+            self.build(version)
+        if not term:
+            ranked = [(0.0, name, id) for id, (name, _, _, _) in self.docs.items()]
+            return sorted(ranked, key=lambda row: (row[1], row[2]))[:limit]
+
+        needle = term.lower()
+        query_words = tokenize(term)
+        matched = set(
+            id for id in self.candidates(term)
+            if needle in self.docs[id][1] or needle in self.docs[id][2]
+        )
+        if query_words:
+            matched |= set.intersection(*[self.words.get(word, set()) for word in query_words])
+        matched |= self.genres.get(needle, set())
+
+        ranked = []
+        for id in matched:
+            name, _, _, words = self.docs[id]
+            # ts_rank stand-in: share of the document made up of query words
+            hits = sum(1 for word in words if word in query_words)
+            score = similarity(name, term) + (hits / float(len(words)) if words else 0.0)
+            ranked.append((round(score, 6), name, id))
+        ranked.sort(key=lambda row: (-row[0], row[1], row[2]))
+        return ranked[:limit]
+
+
+class SearchIndexes(object):
+    # the app's fallback indexes, one per model, in app.extensions so apps on
+    # different databases never share one
+
+    def init_app(self, app):
+        self.indexes = dict((model, InvertedIndex(model)) for model in (Artist, Venue))
+        app.extensions['search_indexes'] = self
+
+
+def search(model, term):
+    # ranked (score, name, id) tuples, best match first
+    term = (term or '').strip()
+    limit = current_app.config['SEARCH_MAX_RESULTS']
+    if db.engine.dialect.name == 'postgresql':
+        return PostgresSearch().search(model, term, limit)
+    return current_app.extensions['search_indexes'].indexes[model].search(term, limit)
+
+
+def load_ranked(model, ranked):
+    # fetch the rows behind one page of ranked results, keeping the rank order
+    ids = [id for _, _, id in ranked]
+    if not ids:
+        return []
+    rows = dict((row.id, row) for row in model.query.filter(model.id.in_(ids)))
+    return [rows[id] for id in ids if id in rows]
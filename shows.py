@@ -0,0 +1,141 @@
+from flask import Blueprint, Response, current_app, render_template, request, flash, stream_with_context, jsonify
+
+from availability import BookingConflict, check_booking, is_conflict_error
+from cache import entity_cache
+from counters import record_show
+from models import db, Artist, Venue, Show, DEFAULT_SHOW_MINUTES
+from pagination import keyset_page, page_args
+from queries import show_rows, SHOW_KEYS
+from tours import TourRejected, book_tour, parse_lines
+
+bp = Blueprint('shows', __name__)
+
+
+def stream_template(template_name, **context):
+  # render a template incrementally; the request context stays open until the
+  # last chunk is sent so lazily iterated queries can keep reading
+  current_app.update_template_context(context)
+  template = current_app.jinja_env.get_template(template_name)
+  return stream_with_context(template.generate(context))
+
+#  Shows
+#  ----------------------------------------------------------------
+
+@bp.route('/shows')
+def shows():
+  # displays list of shows at /shows
+  # TODO: replace with real venues data.
+  #status: done
+  # join shows with their artist and venue in one query, one page at a time,
+  # and stream the rendered page out as it is generated
+  page = keyset_page(show_rows(), SHOW_KEYS, **page_args())
+  return Response(stream_template('pages/shows.html', shows=page.items, page=page))
+
+@bp.route('/shows/create')
+def create_shows():
+  from forms import ShowForm
+  # renders form. do not touch.
+  form = ShowForm()
+  return render_template('forms/new_show.html', form=form)
+
+@bp.route('/shows/create', methods=['POST'])
+def create_show_submission():
+  from forms import ShowForm
+  # called to create new shows in the db, upon submitting new show listing form
+  # TODO: insert form data as a new Show record in the db, instead
+  try:
+    #retrieve form data, letting the form parse start_time into a datetime
+    form = ShowForm(request.form)
+    show = Show(
+      artist_id=int(form.artist_id.data),
+      venue_id=int(form.venue_id.data),
+      start_time=form.start_time.data,
+      duration_minutes=form.duration_minutes.data or DEFAULT_SHOW_MINUTES
+    )
+    # refuse a show that overlaps one its artist or venue already has; on
+    # Postgres the exclusion constraints also catch two bookings racing
+    check_booking(show.artist_id, show.venue_id, show.start_time, show.end_time)
+    db.session.add(show)
+    # count the show on its artist and venue in the same transaction
+    record_show(show)
+    artist_id, venue_id = show.artist_id, show.venue_id
+    db.session.commit()
+    entity_cache.invalidate(Artist, artist_id)
+    entity_cache.invalidate(Venue, venue_id)
+    flash('Show was successfully listed!')
+  except BookingConflict as err:
+    db.session.rollback()
+    flash('Show could not be listed: %s.' % err)
+  except Exception as err:
+    db.session.rollback()
+    if is_conflict_error(err):
+      flash('Show could not be listed: the artist or venue is already booked then.')
+    else:
+      flash('An error occured. Show could not be listed.')
+  finally:
+    db.session.close()
+  
+  return render_template('pages/home.html')
+  # on successful db insert, flash success
+  #flash('Show was successfully listed!')
+  # TODO: on unsuccessful db insert, flash an error instead.
+  # e.g., flash('An error occurred. Show could not be listed.')
+  # see: http://flask.pocoo.org/docs/1.0/patterns/flashing/
+  #return render_template('pages/home.html')
+
+@bp.route('/shows/tour')
+def create_tour_form():
+  from forms import TourForm
+  return render_template('forms/new_tour.html', form=TourForm())
+
+@bp.route('/shows/tour', methods=['POST'])
+def create_tour_submission():
+  # a whole tour in one request: a JSON list of shows (or {"shows": [...]})
+  # or the form's one-show-per-line text. Nothing is listed unless every row
+  # is valid; the errors come back per row (JSON index or form line)
+  from forms import TourForm
+  form = None
+  if request.is_json:
+    rows = request.get_json(silent=True)
+    if isinstance(rows, dict):
+      rows = rows.get('shows')
+    if not isinstance(rows, list):
+      return jsonify(error='expected a JSON list of shows'), 400
+    positions = list(range(len(rows)))
+  else:
+    form = TourForm(request.form)
+    if not form.validate():
+      return render_template('forms/new_tour.html', form=form), 400
+    positions, rows = parse_lines(form.shows.data)
+  limit = current_app.config['TOUR_MAX_SHOWS']
+  if not rows or len(rows) > limit:
+    message = 'A tour needs between 1 and %d shows.' % limit
+    return tour_response(form, 400, error=message)
+  try:
+    shows = book_tour(rows)
+    db.session.commit()
+  except TourRejected as err:
+    db.session.rollback()
+    errors = [{'row': positions[index], 'errors': row_errors} for index, row_errors in err.errors]
+    return tour_response(form, 400, errors=errors)
+  except Exception as err:
+    db.session.rollback()
+    if is_conflict_error(err):
+      return tour_response(form, 409, error='An artist or venue was booked for one of these times meanwhile.')
+    return tour_response(form, 500, error='An error occured. The tour could not be listed.')
+  finally:
+    db.session.close()
+  entity_cache.invalidate(Artist, *set(show['artist_id'] for show in shows))
+  entity_cache.invalidate(Venue, *set(show['venue_id'] for show in shows))
+  if form is None:
+    return jsonify(created=len(shows)), 201
+  flash('%d shows were successfully listed!' % len(shows))
+  return render_template('pages/home.html')
+
+def tour_response(form, status, error=None, errors=None):
+  if form is None:
+    body = {'error': error or 'some shows were rejected'}
+    if errors is not None:
+      body['errors'] = errors
+    return jsonify(body), status
+  return render_template('forms/new_tour.html', form=form, error=error, errors=errors), status
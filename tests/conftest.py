@@ -0,0 +1,34 @@
+import os
+import sys
+
+import pytest
+
+# the app is a set of top-level modules in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+from models import db  # noqa: E402
+
+
+@pytest.fixture
+def app(tmp_path):
+    # a fresh SQLite database per test; the page and ETag caches are off so
+    # every request runs its view
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///%s' % (tmp_path / 'fyyur.db'),
+        'TESTING': True,
+        'WTF_CSRF_ENABLED': False,
+        'PAGE_CACHE': False,
+        'CONDITIONAL_PAGES': False,
+    })
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
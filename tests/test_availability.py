@@ -0,0 +1,136 @@
+import json
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from availability import Bookings, IntervalTree, find_conflicts, free_slots
+from counters import record_show
+from models import db, Artist, Venue, Show
+from tours import TourRejected, book_tour
+
+# no two shows of one artist or one venue overlap; a show that starts when
+# another ends does not overlap it
+
+EIGHT_PM = datetime(2033, 1, 1, 20)
+
+
+def at(hour, minute=0):
+    return EIGHT_PM.replace(hour=hour, minute=minute)
+
+
+@pytest.fixture
+def booked(app):
+    # artists 1 and 2, venues 1 and 2; artist 1 plays venue 1 from 20:00 to 22:00
+    with app.app_context():
+        for name in ('Guns N Petals', 'Matt Quevedo'):
+            db.session.add(Artist(name=name, city='Austin', state='TX'))
+        for name in ('Park Hall', 'The Dueling Pianos'):
+            db.session.add(Venue(name=name, city='Austin', state='TX'))
+        db.session.flush()
+        show = Show(artist_id=1, venue_id=1, start_time=EIGHT_PM, duration_minutes=120)
+        db.session.add(show)
+        record_show(show)
+        db.session.commit()
+    return app
+
+
+def test_interval_tree_back_to_back_does_not_overlap():
+    tree = IntervalTree()
+    tree.add(at(20), at(22), 'show')
+    assert tree.overlapping(at(22), at(23)) == []
+    assert tree.overlapping(at(18), at(20)) == []
+    assert tree.overlapping(at(21, 59), at(23)) == [(at(20), at(22), 'show')]
+    assert tree.overlapping(at(19), at(20, 1)) == [(at(20), at(22), 'show')]
+    assert tree.overlapping(at(20, 30), at(21)) == [(at(20), at(22), 'show')]
+
+
+def test_interval_tree_matches_a_scan():
+    rnd = random.Random(1)
+    tree, intervals = IntervalTree(), []
+    for i in range(500):
+        start = EIGHT_PM + timedelta(minutes=rnd.randrange(0, 60 * 24 * 30))
+        end = start + timedelta(minutes=rnd.randrange(1, 1440))
+        tree.add(start, end, i)
+        intervals.append((start, end, i))
+    assert len(tree) == 500
+    for _ in range(200):
+        start = EIGHT_PM + timedelta(minutes=rnd.randrange(0, 60 * 24 * 30))
+        end = start + timedelta(minutes=rnd.randrange(1, 600))
+        expected = sorted(interval for interval in intervals if interval[0] < end and interval[1] > start)
+        assert sorted(tree.overlapping(start, end)) == expected
+
+
+def test_find_conflicts(booked):
+    with booked.app_context():
+        assert find_conflicts(2, 2, at(20), at(22)) == []
+        assert find_conflicts(1, 2, at(22), at(23)) == []
+        assert find_conflicts(2, 1, at(18), at(20)) == []
+        assert find_conflicts(2, 1, at(21), at(23)) == [('venue', 1, at(20), at(22))]
+        assert find_conflicts(1, 1, at(21), at(23)) == [('venue', 1, at(20), at(22)), ('artist', 1, at(20), at(22))]
+
+
+def test_bookings_see_earlier_rows_of_the_same_batch(booked):
+    with booked.app_context():
+        bookings = Bookings()
+        assert bookings.conflicts(2, 2, at(20), at(21)) == []
+        bookings.add(2, 2, at(20), at(21), 'new')
+        assert bookings.conflicts(2, 1, at(21), at(22)) == [('venue', 1, at(20), at(22))]
+        assert bookings.conflicts(2, 2, at(20, 30), at(22)) == [('venue', 'new', at(20), at(21)),
+                                                                  ('artist', 'new', at(20), at(21))]
+        assert bookings.conflicts(2, 2, at(21), at(22)) == []
+
+
+def test_free_slots(booked):
+    with booked.app_context():
+        db.session.add(Show(artist_id=2, venue_id=1, start_time=at(22, 30), duration_minutes=60))
+        db.session.commit()
+        assert free_slots(1, at(12), at(23, 59)) == [(at(12), at(20))]
+        assert free_slots(1, at(12), at(23, 59), min_minutes=30) == [(at(12), at(20)), (at(22), at(22, 30))]
+        assert free_slots(1, at(21), at(22, 30)) == []
+        assert free_slots(2, at(12), at(14)) == [(at(12), at(14))]
+
+
+@pytest.mark.parametrize('start, listed', [
+    ('2033-01-01 22:00:00', True),
+    ('2033-01-01 18:00:00', True),
+    ('2033-01-01 21:00:00', False),
+])
+def test_create_show_refuses_overlaps(booked, client, start, listed):
+    response = client.post('/shows/create', data={'artist_id': '2', 'venue_id': '1', 'start_time': start})
+    assert response.status_code == 200
+    with booked.app_context():
+        assert Show.query.count() == (2 if listed else 1)
+    assert (b'successfully listed' in response.data) == listed
+
+
+def test_tour_rows_clash_with_each_other(booked):
+    with booked.app_context():
+        rows = [
+            {'artist_id': 2, 'venue_id': 2, 'start_time': '2033-01-02 20:00'},
+            {'artist_id': 2, 'venue_id': 1, 'start_time': '2033-01-02 21:00'},
+            {'artist_id': 1, 'venue_id': 2, 'start_time': '2033-01-02 22:00'},
+        ]
+        with pytest.raises(TourRejected) as rejected:
+            book_tour(rows)
+        assert rejected.value.errors == [(1, {'start_time': ['the artist is booked from 2033-01-02 20:00 to 2033-01-02 22:00']})]
+
+
+def test_import_rows_clash_with_each_other(booked, tmp_path):
+    # the clashing rows are in different chunks
+    path = tmp_path / 'shows.jsonl'
+    rows = [
+        {'artist_id': 2, 'venue_id': 2, 'start_time': '2033-01-02 20:00:00'},
+        {'artist_id': 1, 'venue_id': 1, 'start_time': '2033-01-01 22:00:00'},
+        {'artist_id': 1, 'venue_id': 2, 'start_time': '2033-01-02 21:00:00'},
+        {'artist_id': 2, 'venue_id': 1, 'start_time': '2033-01-01 21:00:00'},
+    ]
+    path.write_text(''.join(json.dumps(row) + '\n' for row in rows))
+    result = booked.test_cli_runner().invoke(args=['fyyur', 'import', 'shows', str(path), '--chunk-size', '2'])
+    assert result.output.startswith('2 shows imported, 2 row(s) rejected')
+    report = [json.loads(line) for line in open(str(path) + '.errors.jsonl')]
+    assert [(entry['line'], entry['errors']) for entry in report if 'line' in entry] == [
+        (3, {'start_time': ['the venue is booked from 2033-01-02 20:00 to 2033-01-02 22:00']}),
+        (4, {'start_time': ['the venue is booked from 2033-01-01 20:00 to 2033-01-01 22:00',
+                            'the venue is booked from 2033-01-01 22:00 to 2033-01-02 00:00']}),
+    ]
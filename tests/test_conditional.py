@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from counters import record_show
+from models import db, Artist, Venue, Show
+
+# profile ETags change with everything the page shows, from bounded reads
+
+
+@pytest.fixture
+def app(app):
+    app.config['CONDITIONAL_PAGES'] = True
+    from conditional import ConditionalPages
+    ConditionalPages().init_app(app)
+    with app.app_context():
+        venue = Venue(name='Park Hall', city='Austin', state='TX')
+        artist = Artist(name='Guns N Petals', city='Austin', state='TX')
+        db.session.add_all([venue, artist])
+        db.session.flush()
+        show = Show(artist_id=artist.id, venue_id=venue.id, start_time=datetime.now() + timedelta(days=1))
+        db.session.add(show)
+        record_show(show)
+        db.session.commit()
+    return app
+
+
+def etag(client, path):
+    response = client.get(path)
+    assert response.status_code == 200
+    return response.headers['ETag']
+
+
+def test_unchanged_profile_is_not_modified(client):
+    tag = etag(client, '/venues/1')
+    assert client.get('/venues/1', headers={'If-None-Match': tag}).status_code == 304
+
+
+def test_new_show_changes_both_profiles(app, client):
+    venue_tag, artist_tag = etag(client, '/venues/1'), etag(client, '/artists/1')
+    with app.app_context():
+        show = Show(artist_id=1, venue_id=1, start_time=datetime.now() + timedelta(days=3))
+        db.session.add(show)
+        record_show(show)
+        db.session.commit()
+    assert etag(client, '/venues/1') != venue_tag
+    assert etag(client, '/artists/1') != artist_tag
+
+
+def test_show_starting_changes_the_profile(app, client):
+    tag = etag(client, '/venues/1')
+    with app.app_context():
+        db.session.query(Show).update({Show.start_time: datetime.now() - timedelta(minutes=1)})
+        db.session.commit()
+        # as if nothing had been written: only the clock moved
+    assert etag(client, '/venues/1') != tag
+
+
+def test_renamed_artist_changes_the_venue_page(app, client):
+    tag = etag(client, '/venues/1')
+    with app.app_context():
+        Artist.query.get(1).name = 'Renamed'
+        db.session.commit()
+    assert etag(client, '/venues/1') != tag
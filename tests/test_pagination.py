@@ -0,0 +1,51 @@
+import base64
+import json
+
+import pytest
+
+from models import db, Artist, Venue
+
+# forged keyset cursors are refused before they reach the database
+
+
+def cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+@pytest.fixture
+def seeded(app):
+    with app.app_context():
+        for i in range(3):
+            db.session.add(Venue(name='Venue %d' % i, city='Austin', state='TX'))
+            db.session.add(Artist(name='Artist %d' % i, city='Austin', state='TX'))
+        db.session.commit()
+    return app
+
+
+@pytest.mark.parametrize('path, values', [
+    ('/venues', [{'a': 1}, 'Austin', 'Venue 0', 1]),
+    ('/venues', ['TX', 'Austin', 'Venue 0', True]),
+    ('/venues', ['TX', None, 'Venue 0', 1]),
+    ('/artists', [[1], 1]),
+    ('/artists', ['Artist 0', '1']),
+    ('/shows', [1, 1]),
+    ('/shows', ['not a date', 1]),
+])
+def test_forged_cursor_is_not_found(seeded, client, path, values):
+    assert client.get(path, query_string={'after': cursor(values)}).status_code == 404
+
+
+def test_forged_cursor_is_a_bad_api_request(seeded, client):
+    response = client.get('/api/v1/artists', query_string={'after': cursor([[1], 1])})
+    assert response.status_code == 400
+
+
+def test_valid_cursor_pages_on(seeded, client):
+    response = client.get('/artists', query_string={'after': cursor(['Artist 0', 1]), 'per_page': 1})
+    assert response.status_code == 200
+    assert b'Artist 1' in response.data and b'Artist 0' not in response.data
+
+
+def test_forged_search_cursor_is_not_found(seeded, client):
+    response = client.get('/artists/search', query_string={'search_term': 'Artist', 'after': cursor([True, [], 1])})
+    assert response.status_code == 404
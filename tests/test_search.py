@@ -0,0 +1,55 @@
+import pytest
+
+import search
+from models import db, Artist, Venue
+
+# the in-process index used on SQLite must find what Postgres' ILIKE and
+# full-text search find
+
+
+@pytest.fixture
+def seeded(app):
+    with app.app_context():
+        db.session.add(Venue(name='Park Hall', city='San Francisco', state='CA'))
+        db.session.add(Venue(name='The Dueling Pianos', city='New York', state='NY'))
+        db.session.add(Artist(name='Guns N Petals', city='San Francisco', state='CA'))
+        db.session.add(Artist(name='Matt Quevedo', city='New York', state='NY'))
+        db.session.commit()
+    return app
+
+
+def names(app, model, term):
+    with app.test_request_context():
+        return sorted(name for _, name, _ in search.search(model, term))
+
+
+@pytest.mark.parametrize('model, term, expected', [
+    (Venue, 'k Ha', ['Park Hall']),
+    (Venue, 'PARK', ['Park Hall']),
+    (Venue, 'an fran', ['Park Hall']),
+    (Artist, 'n p', ['Guns N Petals']),
+    (Artist, 'new york', ['Matt Quevedo']),
+    (Artist, 'xyz', []),
+])
+def test_substring_matches(seeded, model, term, expected):
+    assert names(seeded, model, term) == expected
+
+
+def test_index_sees_writes_from_another_app(seeded):
+    # another worker: its own app and index on the same database
+    from app import create_app
+    other = create_app(dict(seeded.config))
+    assert names(seeded, Artist, 'Quevedo') == ['Matt Quevedo']
+    with other.app_context():
+        db.session.add(Artist(name='Nina Quevedo', city='Austin', state='TX'))
+        db.session.commit()
+    assert names(seeded, Artist, 'Quevedo') == ['Matt Quevedo', 'Nina Quevedo']
+
+
+def test_apps_do_not_share_an_index(seeded, tmp_path):
+    from app import create_app
+    other = create_app(dict(seeded.config, SQLALCHEMY_DATABASE_URI='sqlite:///%s' % (tmp_path / 'other.db')))
+    with other.app_context():
+        db.create_all()
+    assert names(seeded, Venue, 'Park') == ['Park Hall']
+    assert names(other, Venue, 'Park') == []
@@ -0,0 +1,93 @@
+import pytest
+
+from models import db, Artist, Venue, Show
+
+# POST /shows/tour lists every show of a tour or none of them
+
+
+@pytest.fixture
+def app(app):
+    # artists 1 and 2, venues 1 and 2, no shows
+    with app.app_context():
+        for name in ('Guns N Petals', 'Matt Quevedo'):
+            db.session.add(Artist(name=name, city='Austin', state='TX'))
+        for name in ('Park Hall', 'The Dueling Pianos'):
+            db.session.add(Venue(name=name, city='Austin', state='TX'))
+        db.session.commit()
+    return app
+
+
+def show_count(app):
+    with app.app_context():
+        return Show.query.count()
+
+
+def test_json_tour_is_created(app, client):
+    response = client.post('/shows/tour', json=[
+        {'artist_id': 1, 'venue_id': 1, 'start_time': '2033-01-01 20:00'},
+        {'artist_id': 1, 'venue_id': 2, 'start_time': '2033-01-02 20:00', 'duration_minutes': 90},
+        {'artist_id': '2', 'venue_id': '1', 'start_time': '2033-01-02T20:00'},
+    ])
+    assert response.status_code == 201
+    assert response.get_json() == {'created': 3}
+    assert show_count(app) == 3
+    with app.app_context():
+        assert Artist.query.get(1).upcoming_shows_count == 2
+        assert Venue.query.get(1).upcoming_shows_count == 2
+
+
+def test_json_tour_accepts_a_shows_object(app, client):
+    response = client.post('/shows/tour', json={'shows': [{'artist_id': 1, 'venue_id': 1, 'start_time': '2033-01-01 20:00'}]})
+    assert response.status_code == 201
+    assert response.get_json() == {'created': 1}
+
+
+def test_one_bad_row_lists_nothing(app, client):
+    response = client.post('/shows/tour', json=[
+        {'artist_id': 1, 'venue_id': 1, 'start_time': '2033-01-01 20:00'},
+        {'artist_id': 9, 'venue_id': 1, 'start_time': '2033-01-02 20:00'},
+        {'artist_id': 2, 'venue_id': 2, 'start_time': '2033-01-03 20:00'},
+        {'artist_id': True, 'venue_id': 2, 'start_time': 'tomorrow', 'duration_minutes': 0},
+    ])
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'some shows were rejected', 'errors': [
+        {'row': 1, 'errors': {'artist_id': ['no artist with id 9']}},
+        {'row': 3, 'errors': {
+            'artist_id': ['Not a valid integer value.'],
+            'start_time': ['Not a valid datetime value (YYYY-MM-DD HH:MM).'],
+            'duration_minutes': ['Number must be between 1 and 1440.'],
+        }},
+    ]}
+    assert show_count(app) == 0
+
+
+def test_form_tour_errors_are_keyed_by_line(app, client):
+    text = '# artist, venue, start\n1, 1, 2033-01-01 20:00\n\n2, 1, 2033-01-01 21:00\n'
+    response = client.post('/shows/tour', data={'shows': text})
+    assert response.status_code == 400
+    assert b'Line 4:' in response.data
+    assert b'the venue is booked from 2033-01-01 20:00 to 2033-01-01 22:00' in response.data
+    assert show_count(app) == 0
+
+
+def test_form_tour_is_created(app, client):
+    response = client.post('/shows/tour', data={'shows': '1, 1, 2033-01-01 20:00\n2, 1, 2033-01-01 22:00, 60'})
+    assert response.status_code == 200
+    assert b'2 shows were successfully listed!' in response.data
+    assert show_count(app) == 2
+
+
+@pytest.mark.parametrize('shows', [0, 3])
+def test_tour_size_is_limited(app, client, shows):
+    app.config['TOUR_MAX_SHOWS'] = 2
+    rows = [{'artist_id': 1, 'venue_id': 1, 'start_time': '2033-01-%02d 20:00' % day} for day in range(1, shows + 1)]
+    response = client.post('/shows/tour', json=rows)
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'A tour needs between 1 and 2 shows.'}
+    assert show_count(app) == 0
+
+
+def test_json_tour_must_be_a_list(client):
+    response = client.post('/shows/tour', json={'artist_id': 1})
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'expected a JSON list of shows'}
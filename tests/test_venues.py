@@ -0,0 +1,36 @@
+import re
+
+from models import db, Venue
+
+# /venues is one grouped query however many cities and venues there are;
+# the page and ETag caches are off (see conftest.py) so only the view's own
+# statements count
+
+STATEMENTS = re.compile(r'desc="(\d+) queries"')
+
+
+def add_venues(app, cities, per_city):
+    with app.app_context():
+        for city, state in cities:
+            for i in range(per_city):
+                db.session.add(Venue(name='%s venue %d' % (city, i), city=city, state=state))
+        db.session.commit()
+
+
+def statements(response):
+    return int(STATEMENTS.search(response.headers['Server-Timing']).group(1))
+
+
+def test_venues_issues_one_statement(app):
+    add_venues(app, [('San Francisco', 'CA'), ('New York', 'NY'), ('Austin', 'TX')], 2)
+    response = app.test_client().get('/venues')
+    assert response.status_code == 200
+    assert b'San Francisco' in response.data and b'Austin' in response.data
+    assert statements(response) == 1
+
+
+def test_venues_statements_do_not_grow_with_venues(app):
+    add_venues(app, [('San Francisco', 'CA')], 1)
+    few = statements(app.test_client().get('/venues'))
+    add_venues(app, [('New York', 'NY'), ('Austin', 'TX'), ('Denver', 'CO')], 4)
+    assert statements(app.test_client().get('/venues')) == few
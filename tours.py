@@ -0,0 +1,135 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import literal, union_all
+
+from availability import Bookings, describe
+from counters import record_show_rows
+from models import db, Artist, Venue, Show, DEFAULT_SHOW_MINUTES, MAX_SHOW_MINUTES
+
+# Whole tours booked in one request (POST /shows/tour). Every row is checked
+# before anything is written: its fields, that its artist and venue exist
+# (one IN query for all of them) and that it overlaps no booked show and no
+# earlier row (one query loads the bookings of every artist and venue in the
+# tour's time window). Then all rows go in with one multi-row INSERT and are
+# counted with one update per artist and venue, in the caller's transaction.
+# A tour with any bad row is refused as a whole, with the errors of each row.
+
+FIELDS = ('artist_id', 'venue_id', 'start_time', 'duration_minutes')
+
+
+class TourRejected(Exception):
+
+    def __init__(self, errors):
+        # [(row index, {field: [messages]})]
+        Exception.__init__(self, '%d row(s) rejected' % len(errors))
+        self.errors = errors
+
+
+def parse_lines(text):
+    # (line numbers, rows) from "artist_id, venue_id, start_time[, minutes]"
+    # lines; blank lines and lines starting with # are skipped
+    lines, rows = [], []
+    for number, line in enumerate(text.splitlines(), 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        lines.append(number)
+        rows.append(dict(zip(FIELDS, [value.strip() for value in line.split(',')])))
+    return lines, rows
+
+
+def integer(value):
+    # ints and digit strings only; int() would also take JSON floats (2.7 -> 2)
+    # and booleans (true -> 1)
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.strip().isdigit():
+        return int(value.strip())
+    raise ValueError(value)
+
+
+def clean(row):
+    # (values, None) or (None, {field: [messages]}) for one row
+    if not isinstance(row, dict):
+        return None, {'row': ['expected an object with %s' % ', '.join(FIELDS)]}
+    values, errors = {}, {}
+    for field in ('artist_id', 'venue_id'):
+        value = row.get(field)
+        try:
+            values[field] = integer(value)
+        except ValueError:
+            errors[field] = ['This field is required.' if value in (None, '') else 'Not a valid integer value.']
+    try:
+        values['start_time'] = datetime.fromisoformat(str(row.get('start_time') or '').strip())
+    except ValueError:
+        errors['start_time'] = ['Not a valid datetime value (YYYY-MM-DD HH:MM).']
+    minutes = row.get('duration_minutes')
+    if minutes in (None, ''):
+        values['duration_minutes'] = DEFAULT_SHOW_MINUTES
+    else:
+        try:
+            values['duration_minutes'] = integer(minutes)
+        except ValueError:
+            errors['duration_minutes'] = ['Not a valid integer value.']
+        else:
+            if not 1 <= values['duration_minutes'] <= MAX_SHOW_MINUTES:
+                errors['duration_minutes'] = ['Number must be between 1 and %d.' % MAX_SHOW_MINUTES]
+    return (None, errors) if errors else (values, None)
+
+
+def existing_ids(artist_ids, venue_ids):
+    # ({artist ids}, {venue ids}) of those that exist, in one statement
+    found = {'artist': set(), 'venue': set()}
+    queries = [
+        db.session.query(literal(kind).label('kind'), model.id).filter(model.id.in_(ids))
+        for kind, model, ids in (('artist', Artist, artist_ids), ('venue', Venue, venue_ids)) if ids
+    ]
+    if queries:
+        for kind, id in db.session.execute(union_all(*[query.statement for query in queries])):
+            found[kind].add(id)
+    return found['artist'], found['venue']
+
+
+def book_tour(rows):
+    # insert the rows as shows and count them, or raise TourRejected; returns
+    # the inserted values. The caller commits.
+    checked, errors = [], []
+    for index, row in enumerate(rows):
+        values, row_errors = clean(row)
+        if row_errors:
+            errors.append((index, row_errors))
+        else:
+            checked.append((index, values))
+
+    artists, venues = existing_ids(set(values['artist_id'] for _, values in checked),
+                                   set(values['venue_id'] for _, values in checked))
+    valid = []
+    for index, values in checked:
+        row_errors = {}
+        for field, ids in (('artist_id', artists), ('venue_id', venues)):
+            if values[field] not in ids:
+                row_errors[field] = ['no %s with id %d' % (field[:-3], values[field])]
+        if row_errors:
+            errors.append((index, row_errors))
+        else:
+            valid.append((index, values))
+
+    if valid:
+        ends = [values['start_time'] + timedelta(minutes=values['duration_minutes']) for _, values in valid]
+        bookings = Bookings()
+        bookings.load([values['artist_id'] for _, values in valid], [values['venue_id'] for _, values in valid],
+                      min(values['start_time'] for _, values in valid), max(ends))
+        for (index, values), end in zip(valid, ends):
+            conflicts = bookings.conflicts(values['artist_id'], values['venue_id'], values['start_time'], end)
+            if conflicts:
+                errors.append((index, {'start_time': [describe(conflict) for conflict in conflicts]}))
+            else:
+                bookings.add(values['artist_id'], values['venue_id'], values['start_time'], end)
+
+    if errors:
+        raise TourRejected(sorted(errors, key=lambda error: error[0]))
+    shows = [values for _, values in valid]
+    if shows:
+        record_show_rows(shows)
+        db.session.execute(Show.__table__.insert().values(shows))
+    return shows
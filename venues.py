@@ -0,0 +1,278 @@
+from flask import Blueprint, render_template, request, flash, redirect, url_for, abort, current_app
+
+from async_database import load_profile as load_profile_async
+from cache import entity_cache
+from counters import remove_shows
+from dates import format_datetimes
+from models import db, Artist, Venue, Show, Genre
+from pagecache import expire_page
+from pagination import keyset_page, ranked_page, page_args
+from profiles import load_profile
+from queries import venue_area_rows, group_venue_areas, with_genre, VENUE_AREA_KEYS
+import search
+
+bp = Blueprint('venues', __name__)
+
+#  Venues
+#  ----------------------------------------------------------------
+
+@bp.route('/venues')
+def venues():
+  # one page of venues ordered by state/city, grouped into the city -> venues
+  # -> upcoming show count tree from one aggregated query, optionally ?genre=
+  genre = request.args.get('genre')
+  page = keyset_page(with_genre(venue_area_rows(), Venue, genre), VENUE_AREA_KEYS, **page_args())
+  data = group_venue_areas(page.items)
+  return render_template('pages/venues.html', areas=data, page=page, genre=genre)
+  
+
+  # TODO: replace with real venues data.
+  #status: done and reviewed
+  
+
+
+  # Previous venues page code with comments before review:
+
+  # #declare the data variable as an empty list
+  # data =[]
+  # # use SQLAlchemy to query the Venue model to get a distinct list of venues
+  # cities = db.session.query(Venue.city, Venue.state).group_by(Venue.city, Venue.state).all()
+  # #use a for loop to iterate through the venues
+  # for city in cities:
+  #   cityinfo = dict(city)
+  #   #further query for further filtering
+  #   venues = db.session.query(Venue.id,Venue.name).filter(
+  #     and_(
+  #       Venue.city == city.city,
+  #       Venue.state == city.state
+  #     )
+  #   ).all()
+  #   cityinfo['venues'] = [{
+  #     'id' : v.id,
+  #     'name' : v.name,
+  #     'num_upcoming_shows' : Show.query.filter(Show.venue_id == v.id).count()
+  #   } for v in venues]
+  #   #append query results to the empty list variable
+  #   data.append(cityinfo)
+  # #return render_template('pages/venues.html', areas=data)
+
+@bp.route('/venues/search', methods=['GET', 'POST'])
+def search_venues():
+  # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
+  # status: done
+  #get the search term and rank venues on name, city and genres through the search index
+  #(the form posts the term, the next/prev links carry it in the query string)
+  search_term = request.values.get('search_term', '')
+  ranked = search.search(Venue, search_term)
+  page = ranked_page(ranked, **page_args())
+  results = search.load_ranked(Venue, page.items)
+  #count the results like the search term and append the names like the search term
+  response = {
+    "count": len(ranked),
+    "data": [{
+      "id": result.id,
+      "name": result.name,
+      "num_upcoming_shows": result.upcoming_shows_count
+    } for result in results]
+  }
+  return render_template('pages/search_venues.html', results=response, search_term=search_term, page=page)
+
+
+@bp.route('/venues/<int:venue_id>')
+def show_venue(venue_id):
+  # TODO: replace with real venue data from the venues table, using venue_id
+  #status: Done
+  # the venue (through the entity cache) and all of its shows in one query,
+  # split into upcoming and past shows in a single pass
+  profile = load_profile(Venue, venue_id, current_app.config['PROFILE_PAST_SHOWS'])
+  if profile is None:
+    abort(404)
+  return render_venue(profile)
+
+async def show_venue_async(venue_id):
+  # the same page read through the async engine (ASYNC_PROFILES); create_app()
+  # routes show_venue here
+  profile = await load_profile_async(Venue, venue_id, current_app.config['PROFILE_PAST_SHOWS'])
+  if profile is None:
+    abort(404)
+  return render_venue(profile)
+
+def render_venue(profile):
+  venue_data = profile.entity
+  if profile.upcoming:
+    # a cached copy of the page is stale once the soonest upcoming show starts
+    expire_page(profile.upcoming[0][0])
+  # iterate through the upcoming shows and append the matching rows of the queried columns
+  upcoming_shows = []
+  start_times = format_datetimes([row[0] for row in profile.upcoming], 'full')
+  for (_, artist_id, artist_name, image_link), start_time in zip(profile.upcoming, start_times):
+    upcoming_shows.append(
+      {
+        "artist_id": artist_id,
+        "artist_name": artist_name,
+        "artist_image_link": image_link,
+        "start_time": start_time
+      }
+    )
+  # iterate through the past shows and append the matching rows of the queried columns
+  past_shows = []
+  start_times = format_datetimes([row[0] for row in profile.past], 'full')
+  for (_, artist_id, artist_name, image_link), start_time in zip(profile.past, start_times):
+    past_shows.append(
+      {
+        "artist_id": artist_id,
+        "artist_name": artist_name,
+        "artist_image_link": image_link,
+        "start_time": start_time
+      }
+    )
+  #assign data and get the past/upcoming shows count using len
+  data={
+    "id":venue_data.id,
+    "name":venue_data.name,
+    "genres": venue_data.genre_names,
+    "address":venue_data.address,
+    "city":venue_data.city,
+    "state":venue_data.state,
+    "phone":venue_data.phone,
+    "website":venue_data.website,
+    "facebook_link":venue_data.facebook_link,
+    "seeking_talent":venue_data.seeking_talent,
+    "seeking_description": venue_data.seeking_description,
+    "image_link":venue_data.image_link,
+    "past_shows": past_shows,
+    "upcoming_shows": upcoming_shows,
+    "past_shows_count": profile.past_count,
+    "upcoming_shows_count": profile.upcoming_count,
+  }
+  
+  return render_template('pages/show_venue.html', venue=data)
+
+#  Create Venue
+#  status: done
+
+@bp.route('/venues/create', methods=['GET'])
+def create_venue_form():
+  from forms import VenueForm
+  form = VenueForm()
+  return render_template('forms/new_venue.html', form=form)
+
+@bp.route('/venues/create', methods=['POST'])
+def create_venue_submission():
+  from forms import VenueForm
+  # TODO: insert form data as a new Venue record in the db, instead
+  # TODO: modify data to be the data object returned from db insertion
+  #status: done
+  try:
+    # request data from the Venue Form
+    form =VenueForm(request.form)
+    # as suggested in the classroom, handle the data coming from Flask-WTF using e.g: venue=Venue(name=form.name.data)
+    venue = Venue(
+      name = form.name.data,
+      city = form.city.data,
+      state = form.state.data,
+      address = form.address.data,
+      phone = form.phone.data,
+      genres = Genre.named(form.genres.data),
+      facebook_link = form.facebook_link.data,
+      image_link = form.image_link.data,
+      website = form.website_link.data,
+      seeking_talent = form.seeking_talent.data, 
+      seeking_description = form.seeking_description.data
+      
+    )
+    # if no errors, add and commit the received form values
+    db.session.add(venue)
+    db.session.commit()
+    flash('Venue ' + form.name.data + ' was successfully listed!')
+
+  except Exception as err:
+    flash('An error occurred. Venue ' + form.name.data + ' could not be listed. ' + str(err))
+    db.session.rollback()
+  finally:
+    db.session.close()
+  return render_template('pages/home.html')
+
+
+@bp.route('/venues/<int:venue_id>/delete', methods=['POST'])
+def delete_venue(venue_id):
+  # TODO: Complete this endpoint for taking a venue_id, and using
+  # SQLAlchemy ORM to delete a record. Handle cases where the session commit could fail.
+  #status: done
+  try:
+    # Query the venue id and delete records with the venue id,
+    # taking its shows off the counters of the artists who played them
+    venue = Venue.query.get(venue_id)
+    touched = remove_shows(Show.venue_id == venue_id)
+    db.session.delete(venue)
+    db.session.commit()
+    entity_cache.invalidate(Venue, venue_id)
+    entity_cache.invalidate(Artist, *touched[Artist])
+    flash('Venue ' + venue.name + ' has been deleted!')
+  except Exception as err:
+    flash('Error! ' + venue.name + ' was not deleted' + str(err))
+    db.session.rollback()
+  finally:
+    db.session.close()
+  return render_template('pages/home.html')
+  # BONUS CHALLENGE: Implement a button to delete a Venue on a Venue Page, have it so that
+  # clicking that button delete it from the db then redirect the user to the homepage
+  #return None
+
+
+@bp.route('/venues/<int:venue_id>/edit', methods=['GET'])
+def edit_venue(venue_id):
+  from forms import VenueForm
+  form = VenueForm()
+  # read the venue through the entity cache to retrieve previous input data
+  venue = entity_cache.get(Venue, venue_id)
+  if venue is None:
+    abort(404)
+  form.name.data =venue.name
+  form.genres.data = venue.genre_names
+  form.address.data =venue.address
+  form.city.data =venue.city
+  form.state.data =venue.state
+  form.phone.data =venue.phone
+  form.website_link.data =venue.website
+  form.facebook_link.data =venue.facebook_link
+  form.seeking_talent.data =venue.seeking_talent
+  form.seeking_description.data = venue.seeking_description
+  form.image_link.data =venue.image_link
+
+  return render_template('forms/edit_venue.html', form=form, venue=venue)
+
+@bp.route('/venues/<int:venue_id>/edit', methods=['POST'])
+def edit_venue_submission(venue_id):
+  from forms import VenueForm
+  # TODO: take values from the form submitted, and update existing
+  # venue record with ID <venue_id> using the new attributes
+  #status: done
+  # retrieve the new inputs from the form
+  form = VenueForm(request.form)
+  try:
+    venue = Venue.query.get(venue_id)
+    venue.name = form.name.data
+    venue.city = form.city.data
+    venue.state = form.state.data
+    venue.address = form.address.data
+    venue.phone = form.phone.data
+    venue.genres = Genre.named(form.genres.data)
+    venue.facebook_link = form.facebook_link.data
+    venue.image_link = form.image_link.data
+    venue.website = form.website_link.data
+    venue.seeking_talent = form.seeking_talent.data
+    venue.seeking_description = form.seeking_description.data
+
+    #add and commit new input
+    db.session.add(venue)
+    db.session.commit()
+    entity_cache.invalidate(Venue, venue_id)
+    flash('Venue updated successfully!')
+  except Exception as err:
+      db.session.rollback()
+      flash('Error updating venue!' + str(err))
+  finally:
+      db.session.close()
+
+  return redirect(url_for('venues.show_venue', venue_id=venue_id))
@@ -0,0 +1,82 @@
+from datetime import datetime
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import db, TableVersion
+
+# Every committed transaction that writes to a tracked table bumps that
+# table's row in table_version, in the same transaction, so all processes
+# (web workers, `flask fyyur import`, cron jobs) see one shared answer to
+# "has this table changed since ...?". ORM flushes, bulk query updates and
+# deletes and Core inserts through the session are all picked up; writes
+# that bypass the session (COPY) call touch() themselves.
+
+# written table -> the table whose data it belongs to
+TRACKED = {
+    'artist': 'artist',
+    'artist_genre': 'artist',
+    'venue': 'venue',
+    'venue_genre': 'venue',
+    'show': 'show',
+}
+
+
+def touch(session, *tables):
+    # mark tables as written by the session's current transaction
+    changed = session.info.setdefault('tables_changed', set())
+    changed.update(TRACKED[table] for table in tables if table in TRACKED)
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_flushed_tables(session, flush_context):
+    touch(session, *[obj.__table__.name for obj in list(session.new) + list(session.dirty) + list(session.deleted)
+                     if hasattr(obj, '__table__')])
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _collect_executed_tables(state):
+    if state.is_insert or state.is_update or state.is_delete:
+        touch(state.session, state.statement.table.name)
+
+
+@event.listens_for(Session, 'before_commit')
+def _bump_table_versions(session):
+    session.flush()
+    changed = session.info.pop('tables_changed', None)
+    if not changed:
+        return
+    # HTTP dates have whole-second resolution
+    now = datetime.utcnow().replace(microsecond=0)
+    for name in sorted(changed):
+        bumped = session.query(TableVersion).filter(TableVersion.name == name).update({
+            TableVersion.version: TableVersion.version + 1,
+            TableVersion.changed_at: now,
+        }, synchronize_session=False)
+        if not bumped:
+            session.add(TableVersion(name=name, version=1, changed_at=now))
+    session.flush()
+    # for after_commit listeners such as the page cache's
+    session.info['tables_bumped'] = changed
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_changed_tables(session):
+    session.info.pop('tables_changed', None)
+    session.info.pop('tables_bumped', None)
+
+
+def table_versions(*tables):
+    # {table: version} for the tables, 0 for one never written
+    versions = dict.fromkeys(tables, 0)
+    versions.update(db.session.query(TableVersion.name, TableVersion.version).filter(
+        TableVersion.name.in_(tables)
+    ).all())
+    return versions
+
+
+def last_modified(*tables):
+    # when any of the tables was last written (UTC), or None if never
+    return db.session.query(db.func.max(TableVersion.changed_at)).filter(
+        TableVersion.name.in_(tables)
+    ).scalar()